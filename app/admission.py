@@ -0,0 +1,166 @@
+# app/admission.py
+"""
+Admission control for the expensive endpoints.
+
+At most ADMISSION_MAX_CONCURRENT requests do upstream/LLM work at once; up to
+ADMISSION_QUEUE_LIMIT more wait (FIFO) for at most ADMISSION_QUEUE_WAIT_MS.
+A request that cannot get in is handed to a `degrade` callback, which may
+return a cheap answer (recent fact or template blurb); if it returns None
+the request is shed with 503 and Retry-After. The callback may also raise an
+exception carrying `status_code` (e.g. a 429 from the per-IP rate limit),
+which is sent as is. Limits are per worker.
+"""
+import asyncio
+import json
+import os
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional
+from urllib.parse import parse_qs
+
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))
+ADMISSION_QUEUE_LIMIT = int(os.getenv("ADMISSION_QUEUE_LIMIT", "32"))
+ADMISSION_QUEUE_WAIT_MS = int(os.getenv("ADMISSION_QUEUE_WAIT_MS", "1000"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "2"))
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded FIFO wait queue. Holds no asyncio objects until used."""
+
+    def __init__(self, limit: int, queue_limit: int, queue_wait: float):
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.queue_wait = queue_wait
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.counts = {"admitted": 0, "queued": 0, "degraded": 0, "shed": 0}
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in the queue if needed. False if the queue is full or the wait times out."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.counts["admitted"] += 1
+            return True
+        if len(self._waiters) >= self.queue_limit:
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.counts["queued"] += 1
+        try:
+            await asyncio.wait({future}, timeout=self.queue_wait)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        if future.done():
+            # release() handed us its slot
+            self.counts["admitted"] += 1
+            return True
+        self._abandon(future)
+        return False
+
+    def _abandon(self, future: asyncio.Future):
+        if future.done():
+            # Granted just as we gave up: pass the slot on
+            self.release()
+            return
+        future.cancel()
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+    def release(self):
+        """Hand the slot to the oldest waiter, or free it."""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(True)
+                return
+        self.active -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "limit": self.limit,
+            "queue_limit": self.queue_limit,
+            **self.counts,
+        }
+
+
+# degrade(path, query params, client IP)
+Degrade = Callable[[str, Dict[str, str], str], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class AdmissionMiddleware:
+    """ASGI middleware gating `paths` through an AdmissionController."""
+
+    def __init__(self, app, controller: AdmissionController, paths: Iterable[str], degrade: Optional[Degrade] = None):
+        self.app = app
+        self.controller = controller
+        self.paths = set(paths)
+        self.degrade = degrade
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        if await self.controller.acquire():
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                self.controller.release()
+
+        params = {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        client = scope.get("client")
+        ip = client[0] if client else "unknown"
+        payload = None
+        if self.degrade is not None:
+            try:
+                payload = await self.degrade(scope["path"], params, ip)
+            except Exception as e:
+                status = getattr(e, "status_code", None)
+                if status is not None:
+                    await _send_json(send, status, {"detail": getattr(e, "detail", str(e))}, [])
+                    return
+                logger.warning("degraded answer failed", extra={"path": scope["path"], "error": str(e)})
+
+        if payload is not None:
+            self.controller.counts["degraded"] += 1
+            await _send_json(send, 200, payload, [(b"x-degraded", b"1")])
+            return
+
+        self.controller.counts["shed"] += 1
+        logger.info("request shed", extra={"path": scope["path"], **self.controller.snapshot()})
+        await _send_json(
+            send, 503, {"detail": "Server busy, please retry shortly."},
+            [(b"retry-after", str(ADMISSION_RETRY_AFTER).encode())],
+        )
+
+
+async def _send_json(send, status: int, payload: Dict[str, Any], headers: list):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# Singleton instance
+admission = AdmissionController(
+    ADMISSION_MAX_CONCURRENT, ADMISSION_QUEUE_LIMIT, ADMISSION_QUEUE_WAIT_MS / 1000,
+)
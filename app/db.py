@@ -3,6 +3,8 @@ import os
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
 from sqlmodel import SQLModel, Field, create_engine
 
 # --------------------------------------
@@ -35,5 +37,32 @@ class Subscriber(SQLModel, table=True):
 # Create tables on startup
 # --------------------------------------
 
+def add_missing_columns():
+    """
+    create_all never alters existing tables, so add any model columns an older
+    database is missing. New columns are nullable; existing rows get NULL.
+    """
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = column.type.compile(dialect=engine.dialect)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {ddl}'))
+            except (OperationalError, ProgrammingError):
+                # Another worker starting up at the same time added it first
+                pass
+
+
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+    try:
+        SQLModel.metadata.create_all(engine)
+    except (IntegrityError, OperationalError, ProgrammingError):
+        # Raced another worker's create_all; a second pass sees its tables
+        SQLModel.metadata.create_all(engine)
+    add_missing_columns()
@@ -1,6 +1,6 @@
 import time
 from collections import deque, defaultdict
-from typing import Callable, Deque, Dict, Set
+from typing import Callable, Deque, Dict, Optional, Set
 from fastapi import HTTPException
 
 class RateLimiter:
@@ -10,16 +10,17 @@ class RateLimiter:
         self.per = per
         self._hits: Dict[str, Deque[float]] = defaultdict(deque)
 
-    def check(self, ip: str):
+    def check(self, ip: str, cost: int = 1):
+        """Charge `cost` requests against the IP's budget (batch endpoints cost more)."""
         now = time.time()
         hits = self._hits[ip]
         # drop old timestamps
         while hits and (now - hits[0]) > self.per:
             hits.popleft()
-        if len(hits) >= self.rate:
+        if len(hits) + cost > self.rate:
             # too many requests
             raise HTTPException(status_code=429, detail="Too many requests, please slow down.")
-        hits.append(now)
+        hits.extend([now] * cost)
 
 class RecentFactsCache:
     """Keep last N facts per sport and avoid repeats for a few generations."""
@@ -37,6 +38,11 @@ class RecentFactsCache:
         q.append(fact)
         s.add(fact)
 
+    def latest(self, sport: str) -> Optional[str]:
+        """Most recently remembered fact for the sport, if any."""
+        q = self._cache.get(sport)
+        return q[-1] if q else None
+
     def unique_generate(self, sport: str, make: Callable[[], str], attempts: int = 6) -> str:
         seen = self._set[sport]
         fact = ""
@@ -0,0 +1,117 @@
+# app/executors.py
+"""
+Named, bounded executors for blocking work, one per dependency.
+
+Each upstream gets its own small pool instead of the loop's shared default
+executor, so a stalled nba_api call cannot hold up email sends or warehouse
+ingest. Every pool also caps how much work may wait for it: past
+`max_workers + max_queue` outstanding calls, `run()` raises ExecutorSaturated
+immediately and the caller falls back, instead of queueing without limit.
+
+The "cpu" pool runs threads by default; set EXECUTOR_CPU_PROCESSES > 0 to use
+a process pool for CPU-heavy steps (its functions and arguments must pickle).
+Pools are created on first use, after uvicorn has forked its workers.
+"""
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised when an executor's queue is full."""
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, max_workers: int, max_queue: int, processes: bool = False):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.processes = processes
+        self.pending = 0
+        self.counts = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._busy_seconds = 0.0
+        self._pool: Optional[Executor] = None
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.processes:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on this pool. Raises ExecutorSaturated if the queue is full."""
+        if self.pending >= self.max_workers + self.max_queue:
+            self.counts["rejected"] += 1
+            raise ExecutorSaturated(f"{self.name} executor saturated ({self.pending} pending)")
+
+        self.pending += 1
+        self.counts["submitted"] += 1
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor(), functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(functools.partial(self._finished, started))
+        # A cancelled caller does not free the worker, so keep counting the call until it really ends
+        return await asyncio.shield(future)
+
+    def _finished(self, started: float, future: asyncio.Future):
+        self.pending -= 1
+        self._busy_seconds += time.perf_counter() - started
+        if future.cancelled() or future.exception() is not None:
+            self.counts["failed"] += 1
+        else:
+            self.counts["completed"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        done = self.counts["completed"] + self.counts["failed"]
+        return {
+            "kind": "process" if self.processes else "thread",
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "queued": max(0, self.pending - self.max_workers),
+            **self.counts,
+            "avg_ms": int(self._busy_seconds / done * 1000) if done else None,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+def _sized(name: str, workers: int, queue: int) -> BoundedExecutor:
+    key = name.upper()
+    return BoundedExecutor(
+        name,
+        int(os.getenv(f"EXECUTOR_{key}_WORKERS", str(workers))),
+        int(os.getenv(f"EXECUTOR_{key}_QUEUE", str(queue))),
+    )
+
+
+CPU_PROCESSES = int(os.getenv("EXECUTOR_CPU_PROCESSES", "0"))
+
+executors: Dict[str, BoundedExecutor] = {
+    "nba_api": _sized("nba_api", 4, 16),
+    "email": _sized("email", 4, 200),
+    "warehouse": _sized("warehouse", 1, 2),
+    "cpu": BoundedExecutor("cpu", CPU_PROCESSES or 1, 4, processes=CPU_PROCESSES > 0),
+}
+
+
+async def run_in(name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call on the named executor."""
+    return await executors[name].run(fn, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: executor.snapshot() for name, executor in executors.items()}
+
+
+def shutdown_executors():
+    for executor in executors.values():
+        executor.shutdown()
@@ -0,0 +1,108 @@
+# app/leader.py
+"""
+Leader election over a database lease, for running several uvicorn workers.
+
+Every worker runs the scheduler, but only the one holding the "leader" lease
+does background work (scheduled sends, warehouse ingest). The leader renews
+the lease every LEADER_RENEW_SECONDS; if it dies, another worker takes over
+once the lease expires after LEADER_LEASE_SECONDS.
+
+Acquiring is a single conditional UPDATE (ours already, or expired), falling
+back to an INSERT for a lease that does not exist yet. A concurrent INSERT
+loses on the primary key, so at most one worker holds a lease at any time.
+"""
+import os
+import socket
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.db import engine
+from app.log import get_logger
+from app.models import Lease
+
+logger = get_logger(__name__)
+
+LEADER_LEASE_SECONDS = int(os.getenv("LEADER_LEASE_SECONDS", "60"))
+LEADER_RENEW_SECONDS = int(os.getenv("LEADER_RENEW_SECONDS", "15"))
+# Held for a whole email run (scheduled or manual), so two runs never overlap
+SEND_LEASE_SECONDS = int(os.getenv("SEND_LEASE_SECONDS", "900"))
+
+# Unique per process, so workers on the same host are told apart
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class DbLease:
+    def __init__(self, name: str, ttl: int, holder: str = WORKER_ID):
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder
+        self.expires_at: Optional[datetime] = None
+
+    @property
+    def held(self) -> bool:
+        """True while our last successful acquire has not expired."""
+        return self.expires_at is not None and datetime.utcnow() < self.expires_at
+
+    def acquire(self) -> bool:
+        """Take the lease if it is free or expired, or extend it if we hold it."""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        try:
+            with Session(engine) as session:
+                result = session.execute(
+                    update(Lease)
+                    .where(Lease.name == self.name)
+                    .where(or_(Lease.holder == self.holder, Lease.expires_at < now))
+                    .values(holder=self.holder, expires_at=expires_at)
+                )
+                if result.rowcount == 0:
+                    session.add(Lease(name=self.name, holder=self.holder, expires_at=expires_at))
+                session.commit()
+        except IntegrityError:
+            # The row exists and someone else holds it
+            self.expires_at = None
+            return False
+        except Exception as e:
+            logger.warning("lease acquire failed", extra={"lease": self.name, "error": str(e)})
+            self.expires_at = None
+            return False
+
+        if not self.held:
+            logger.info("lease acquired", extra={"lease": self.name, "holder": self.holder})
+        self.expires_at = expires_at
+        return True
+
+    def release(self):
+        if self.expires_at is None:
+            return
+        self.expires_at = None
+        try:
+            with Session(engine) as session:
+                session.execute(delete(Lease).where(Lease.name == self.name).where(Lease.holder == self.holder))
+                session.commit()
+        except Exception as e:
+            logger.warning("lease release failed", extra={"lease": self.name, "error": str(e)})
+
+
+@contextmanager
+def exclusive(name: str, ttl: int):
+    """Hold lease `name` for the duration of a block. Yields False if another worker holds it."""
+    # A holder per call, so two runs in the same worker also exclude each other
+    lease = DbLease(name, ttl, holder=f"{WORKER_ID}-{uuid.uuid4().hex[:6]}")
+    if not lease.acquire():
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        lease.release()
+
+
+# Singleton instance
+leader = DbLease("leader", LEADER_LEASE_SECONDS)
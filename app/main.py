@@ -1,12 +1,15 @@
 # app/main.py
+import asyncio
+import json
+import math
 import os
 import random
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from fastapi import FastAPI, Request, HTTPException, Query
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from sqlmodel import Session, select
 
 from app.db import create_db_and_tables, engine
@@ -14,27 +17,121 @@ from app.models import Subscriber
 from app.schemas import SubscribeIn, SubscribeOut
 
 from app.deps import RateLimiter, RecentFactsCache
-from app.pipeline.fetchers import fetch_sport_sample
+from app.pipeline.fetchers import fetch_sport_sample, fetch_sport_batch, hedge_stats
 from app.pipeline.agents import render_blurb
-from app.pipeline.llm import compose_fact  # OpenRouter-backed compose
+from app.pipeline.llm import (  # OpenRouter-backed compose
+    compose_fact_routed, compose_facts_routed, router, BATCH_SIZE, LLM_BUDGETS_MS,
+)
 from app.services.email_service import email_service
+from app.services.fact_archive import fact_archive
+from app.services.fact_of_the_day import fact_of_the_day, utc_today, SPORTS
+from app.services.feed import etag_matches, fact_feed, MEDIA_TYPES
+from app.services.suppression import record_events, verify_signature, RESEND_WEBHOOK_SECRET
+from app.scheduler import start_background, stop_scheduler
+from app.leader import exclusive, SEND_LEASE_SECONDS
+from app.profiling import profiled, should_profile, PROFILE_EMAIL_RUNS
+from app.log import configure_logging, get_logger, shutdown_logging, RequestIdMiddleware
+from app.admission import admission, AdmissionMiddleware
+from app.executors import executor_stats, shutdown_executors
+
+configure_logging()
+logger = get_logger(__name__)
 
 app = FastAPI()
-templates = Jinja2Templates(directory="app/templates")
-
-# In-memory singletons (fine for MVP / single-process)
-limiter = RateLimiter(rate=8, per=60)       # 8 requests/min/IP
+_templates = None
+
+
+def templates():
+    """Jinja environment, built on the first page render rather than at import."""
+    global _templates
+    if _templates is None:
+        from fastapi.templating import Jinja2Templates
+        _templates = Jinja2Templates(directory="app/templates")
+    return _templates
+
+# In-memory singletons. With WEB_CONCURRENCY > 1 each worker keeps its own copy:
+# the recent-facts cache, LLM cache, in-flight dedup and the rate limit are per
+# worker. Each worker allows the full rate, since a keep-alive client stays on
+# one worker; a client spread over W workers can get up to W times the rate.
+# Background jobs run on one worker only (see app/leader.py).
+RATE_LIMIT_PER_MIN = 8
+limiter = RateLimiter(rate=RATE_LIMIT_PER_MIN, per=60)  # 8 requests/min/IP per worker
 recent_cache = RecentFactsCache(maxlen=15)  # remember last 15 facts per sport
 
+# Batch generation: one upstream fetch, n composes with a bounded fan-out.
+# Each rate-limit hit pays for BATCH_FACTS_PER_HIT facts, so n=25 costs 5 of 8;
+# a batch must cost no more than RATE_LIMIT_PER_MIN or it could never pass.
+BATCH_MAX = 25
+BATCH_FACTS_PER_HIT = 5
+BATCH_CONCURRENCY = int(os.getenv("BATCH_COMPOSE_CONCURRENCY", "4"))
+
+# Cache lifetime of a fact-of-the-day answer missing a sport, so it is retried soon
+FOTD_PARTIAL_MAX_AGE = 60
+
+
+async def degraded_answer(path: str, params: dict, ip: str) -> Optional[dict]:
+    """
+    Cheap answer for a request turned away by admission control: this worker's
+    most recent fact for the sport, else a template blurb from the warehouse.
+    Both are in memory, so an overloaded worker does no DB work here. Still
+    counts against the per-IP rate limit. None sheds it.
+    """
+    if path != "/api/generate":
+        return None
+    limiter.check(ip)
+    sport = params.get("sport")
+    sports = [sport] if sport in ("mlb", "nba") else random.sample(["mlb", "nba"], 2)
+    for each in sports:
+        text = recent_cache.latest(each)
+        if text:
+            return {"text": text.strip(), "source": "recent", "sport": each, "llm": False}
+    from app.pipeline.warehouse import warehouse
+    fields = warehouse.sample(sport if sport in ("mlb", "nba") else random.choice(["mlb", "nba"]))
+    if fields:
+        return {"text": render_blurb(fields), "source": "template", "sport": fields["sport"], "llm": False}
+    return None
+
+
+# Order matters: the last middleware added runs first, so shed responses still get a request ID
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission,
+    paths=["/api/generate", "/api/generate/batch"],
+    degrade=degraded_answer,
+)
+app.add_middleware(RequestIdMiddleware)
+
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     create_db_and_tables()
+    # The warehouse snapshot (NumPy) and the scheduler load after the server is
+    # listening, so a restart answers /healthz without waiting for them
+    app.state.background = asyncio.ensure_future(start_background())
+    app.state.background.add_done_callback(_background_done)
+
+
+def _background_done(task: asyncio.Future):
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logger.error("background startup failed", extra={"error": repr(task.exception())})
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    background = getattr(app.state, "background", None)
+    if background is not None and not background.done():
+        background.cancel()
+    stop_scheduler()
+    await email_service.close()
+    shutdown_executors()
+    shutdown_logging()
 
 
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates().TemplateResponse("index.html", {"request": request})
 
 
 @app.get("/healthz")
@@ -42,12 +139,33 @@ def healthcheck():
     return {"ok": True}
 
 
+@app.get("/api/metrics")
+def metrics():
+    """Admission queue depth and shed counts, executor queues, model routing and fetch hedging stats (this worker only)."""
+    return {
+        "admission": admission.snapshot(),
+        "executors": executor_stats(),
+        "models": router.snapshot(),
+        "fetch": hedge_stats,
+    }
+
+
 @app.get("/api/generate", response_class=JSONResponse)
 async def generate_fact(
     request: Request,
     sport: Optional[str] = Query(None, description="Sport type: mlb, nba, or random"),
     debug: Optional[int] = 0,
+    profile: Optional[int] = Query(0, description="Profile this request (needs secret)"),
+    secret: Optional[str] = Query(None, description="Secret key for admin access"),
 ):
+    with profiled("generate", should_profile(profile, secret)) as sampler:
+        payload = await _generate_fact(request, sport, debug)
+    if sampler is not None and profile and isinstance(payload, dict):
+        payload["profile"] = sampler.path
+    return payload
+
+
+async def _generate_fact(request: Request, sport: Optional[str], debug: Optional[int]):
     # Rate limit per client IP
     ip = request.client.host if request.client else "unknown"
     limiter.check(ip)
@@ -55,34 +173,88 @@ async def generate_fact(
     try:
         # 1) Fetch live data (MLB or NBA based on sport param or random)
         fields = await fetch_sport_sample(sport)
-        
-        # Get sport name for caching
-        sport_key = fields.get("sport", "unknown")
-
-        # 2) Ask OpenRouter LLM to compose a one-liner (returns None on failure)
-        llm_sentence = compose_fact(fields)
-
-        # 3) Fallback to deterministic blurb if LLM didn't return content
-        sentence = llm_sentence if llm_sentence else render_blurb(fields)
-
-        # 4) Avoid immediate duplicates
-        if sentence in recent_cache._set.get(sport_key, set()):
-            sentence = sentence + " "
-        recent_cache.remember(sport_key, sentence)
-
-        # 5) Build response
+        if fields.get("fact_type") == "error":
+            raise RuntimeError(fields.get("error", "No data available"))
+    except Exception as e:
+        # Upstream is down: serve a previously generated fact instead of failing
+        archived = fact_archive.fallback(sport)
+        if archived is None:
+            if debug:
+                return JSONResponse(
+                    status_code=502,
+                    content={"detail": "Failed to fetch sports data", "error": str(e)},
+                )
+            raise HTTPException(status_code=502, detail="Failed to fetch sports data")
         payload = {
-            "text": sentence,
-            "source": "api",
-            "sport": sport_key,
-            "llm": bool(llm_sentence),  # True if OpenRouter produced the sentence
+            "text": archived.text,
+            "source": "archive",
+            "sport": archived.sport,
+            "llm": archived.llm,
         }
         if debug:
-            payload["fields"] = fields
-            payload["llm_provider"] = "openrouter"
-            payload["model"] = os.getenv("OPENROUTER_MODEL", "")
+            payload["error"] = str(e)
+            payload["archived_at"] = archived.created_at.isoformat()
         return payload
 
+    # Get sport name for caching
+    sport_key = fields.get("sport", "unknown")
+
+    # 2) Ask OpenRouter LLM to compose a one-liner (text is None on failure or
+    #    when it misses the latency budget)
+    route = await compose_fact_routed(fields, budget_ms=LLM_BUDGETS_MS["generate"])
+    llm_sentence = route.text
+
+    # 3) Fallback to deterministic blurb if LLM didn't return content
+    sentence = llm_sentence if llm_sentence else render_blurb(fields)
+
+    # 4) Avoid immediate duplicates
+    if sentence in recent_cache._set.get(sport_key, set()):
+        sentence = sentence + " "
+    recent_cache.remember(sport_key, sentence)
+
+    # 5) Archive for history and offline fallback
+    fact_archive.record(
+        fields,
+        sentence.strip(),
+        model=route.model if llm_sentence else "template",
+        llm=bool(llm_sentence),
+        latency_ms=route.latency_ms,
+    )
+
+    # 6) Build response
+    payload = {
+        "text": sentence,
+        "source": "api",
+        "sport": sport_key,
+        "llm": bool(llm_sentence),  # True if OpenRouter produced the sentence
+    }
+    if debug:
+        payload["fields"] = dict(fields)
+        payload["llm_provider"] = "openrouter"
+        payload["model"] = route.model
+        payload["routing"] = {
+            "reason": route.reason,
+            "hedged": route.hedged,
+            "latency_ms": route.latency_ms,
+            "models": router.snapshot(),
+        }
+    return payload
+
+
+@app.get("/api/generate/batch", response_class=JSONResponse)
+async def generate_fact_batch(
+    request: Request,
+    sport: Optional[str] = Query(None, description="Sport type: mlb, nba, or random"),
+    n: int = Query(10, ge=1, le=BATCH_MAX, description="Number of facts"),
+    debug: Optional[int] = 0,
+):
+    # Rate limit per client IP, charged by batch size
+    ip = request.client.host if request.client else "unknown"
+    limiter.check(ip, cost=math.ceil(n / BATCH_FACTS_PER_HIT))
+
+    try:
+        # 1) Fetch the upstream dataset once and sample n distinct records
+        records = await fetch_sport_batch(sport, n)
     except Exception as e:
         if debug:
             return JSONResponse(
@@ -91,6 +263,145 @@ async def generate_fact(
             )
         raise HTTPException(status_code=502, detail="Failed to fetch sports data")
 
+    # 2) Compose in chunks of BATCH_SIZE records per LLM request, with a bounded fan-out
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def compose(chunk: list) -> list:
+        async with semaphore:
+            llm_sentences, route = await compose_facts_routed(chunk, budget_ms=LLM_BUDGETS_MS["batch"])
+
+        facts = []
+        for fields, llm_sentence in zip(chunk, llm_sentences):
+            sentence = llm_sentence if llm_sentence else render_blurb(fields)
+            sport_key = fields.get("sport", "unknown")
+            recent_cache.remember(sport_key, sentence)
+            fact = {
+                "text": sentence,
+                "source": "api",
+                "sport": sport_key,
+                "llm": bool(llm_sentence),
+            }
+            if debug:
+                fact["fields"] = dict(fields)
+            archive_rows.append((
+                fields,
+                sentence,
+                route.model if llm_sentence else "template",
+                bool(llm_sentence),
+                route.latency_ms,
+            ))
+            facts.append(fact)
+        return facts
+
+    archive_rows = []
+    chunks = [records[i:i + BATCH_SIZE] for i in range(0, len(records), BATCH_SIZE)]
+    composed = await asyncio.gather(*(compose(chunk) for chunk in chunks))
+    facts = [fact for chunk_facts in composed for fact in chunk_facts]
+    fact_archive.record_many(archive_rows)
+    return {"count": len(facts), "facts": facts}
+
+
+@app.get("/api/fact-of-the-day")
+async def get_fact_of_the_day(
+    request: Request,
+    sport: Optional[str] = Query(None, description="mlb or nba; both if omitted"),
+):
+    """
+    Today's stored fact per sport (UTC date). Cacheable by browsers and CDNs
+    until UTC midnight once every requested sport has its fact; a partial
+    answer is cached for FOTD_PARTIAL_MAX_AGE seconds only. A matching
+    If-None-Match gets 304.
+    """
+    if sport is not None and sport not in SPORTS:
+        raise HTTPException(status_code=400, detail="Unknown sport.")
+    day = utc_today()
+    requested = [sport] if sport else SPORTS
+    facts = []
+    for s in requested:
+        fact = await fact_of_the_day.ensure(s, day)
+        if fact is not None:
+            facts.append(fact)
+    if not facts:
+        raise HTTPException(status_code=503, detail="No fact of the day available yet")
+
+    midnight = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    max_age = max(60, int((midnight - datetime.now(timezone.utc)).total_seconds()))
+    if len(facts) < len(requested):
+        max_age = min(max_age, FOTD_PARTIAL_MAX_AGE)
+    headers = {
+        "ETag": '"fotd-{}-{}"'.format(day.isoformat(), "-".join(str(fact.id) for fact in facts)),
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(
+        content={
+            "date": day.isoformat(),
+            "facts": [{"sport": fact.sport, "text": fact.text, "llm": fact.llm} for fact in facts],
+        },
+        headers=headers,
+    )
+
+
+@app.get("/api/facts", response_class=JSONResponse)
+def fact_history(
+    sport: Optional[str] = Query(None, description="Filter by sport: mlb or nba"),
+    before: Optional[str] = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Newest-first history of generated facts, keyset-paginated."""
+    try:
+        facts, next_cursor = fact_archive.history(sport, before, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {
+        "facts": [
+            {
+                "id": fact.id,
+                "text": fact.text,
+                "sport": fact.sport,
+                "llm": fact.llm,
+                "model": fact.model,
+                "latency_ms": fact.latency_ms,
+                "created_at": fact.created_at.isoformat(),
+            }
+            for fact in facts
+        ],
+        "next": next_cursor,
+    }
+
+
+@app.get("/feed.json")
+def feed_json(request: Request, sport: Optional[str] = Query(None, description="mlb or nba; all if omitted")):
+    return _feed_response(request, "json", sport)
+
+
+@app.get("/feed.rss")
+def feed_rss(request: Request, sport: Optional[str] = Query(None, description="mlb or nba; all if omitted")):
+    return _feed_response(request, "rss", sport)
+
+
+def _feed_response(request: Request, fmt: str, sport: Optional[str]) -> Response:
+    """Recent archived facts; pollers get 304 until a new fact is generated."""
+    if sport is not None and sport not in SPORTS:
+        raise HTTPException(status_code=400, detail="Unknown sport.")
+    feed = fact_feed.render(fmt, sport)
+    headers = {"ETag": feed.etag, "Cache-Control": "public, max-age=60"}
+    if feed.last_modified:
+        headers["Last-Modified"] = feed.last_modified
+    if fact_feed.not_modified(feed, request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=feed.body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+def check_admin_secret(secret: Optional[str]):
+    # Simple protection - in production use proper auth
+    admin_secret = os.getenv("ADMIN_SECRET", "dev-secret-123")
+    if secret != admin_secret:
+        raise HTTPException(status_code=403, detail="Invalid secret key")
+
 
 @app.post("/api/subscribe", response_model=SubscribeOut)
 async def subscribe(body: SubscribeIn):
@@ -103,12 +414,21 @@ async def subscribe(body: SubscribeIn):
         if s in flags:
             flags[s] = True
 
+    # Deliver at the subscriber's local morning; default to UTC
+    zone_name = body.timezone or "UTC"
+    try:
+        zone = ZoneInfo(zone_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="Unknown time zone.")
+
     with Session(engine) as session:
         # Upsert by email
         existing = session.exec(select(Subscriber).where(Subscriber.email == body.email)).first()
         if existing:
             existing.nba = flags["nba"]
             existing.mlb = flags["mlb"]
+            if body.timezone:
+                existing.timezone = zone_name
             existing.updated_at = datetime.utcnow()
             session.add(existing)
             session.commit()
@@ -118,6 +438,9 @@ async def subscribe(body: SubscribeIn):
                 email=body.email,
                 nba=flags["nba"],
                 mlb=flags["mlb"],
+                timezone=zone_name,
+                # First daily email goes out tomorrow morning, as the welcome email says
+                last_sent_on=datetime.now(zone).date(),
             )
             session.add(sub)
             session.commit()
@@ -157,6 +480,7 @@ def email_status():
     return {
         "configured": email_service.is_configured(),
         "from_email": os.getenv("FROM_EMAIL", "not set"),
+        "transport": email_service.transport.name,
         "has_resend_key": bool(os.getenv("RESEND_API_KEY", ""))
     }
 
@@ -167,7 +491,7 @@ async def send_test_email(email: str, sport: str = "random"):
     if not email_service.is_configured():
         raise HTTPException(
             status_code=503, 
-            detail="Email service not configured. Set RESEND_API_KEY env variable."
+            detail="Email service not configured. Set RESEND_API_KEY (or EMAIL_TRANSPORT=smtp and SMTP_HOST)."
         )
     
     # Generate fact
@@ -189,36 +513,70 @@ async def send_test_email(email: str, sport: str = "random"):
 @app.post("/api/email/send-daily")
 async def send_daily_emails(
     sport: str = "random",
-    secret: Optional[str] = Query(None, description="Secret key for admin access")
+    secret: Optional[str] = Query(None, description="Secret key for admin access"),
+    profile: Optional[int] = Query(0, description="Write a profile of this run"),
 ):
     """Send daily emails to all subscribers. Protected by secret key."""
-    # Simple protection - in production use proper auth
-    admin_secret = os.getenv("ADMIN_SECRET", "dev-secret-123")
-    if secret != admin_secret:
-        raise HTTPException(status_code=403, detail="Invalid secret key")
+    check_admin_secret(secret)
     
     if not email_service.is_configured():
         raise HTTPException(
             status_code=503, 
-            detail="Email service not configured. Set RESEND_API_KEY env variable."
+            detail="Email service not configured. Set RESEND_API_KEY (or EMAIL_TRANSPORT=smtp and SMTP_HOST)."
         )
     
-    # Send emails
-    result = await email_service.send_daily_emails(sport)
+    # Send emails; the lease keeps this from overlapping a run on another worker
+    with exclusive("email-send", SEND_LEASE_SECONDS) as acquired:
+        if not acquired:
+            raise HTTPException(status_code=409, detail="An email run is already in progress")
+        with profiled("send-daily", bool(profile) or PROFILE_EMAIL_RUNS) as sampler:
+            result = await email_service.send_daily_emails(sport)
     
-    return {
+    response = {
         "success": True,
         "total_subscribers": result["total"],
         "sent": result["sent"],
         "failed": result["failed"],
+        "suppressed": result["suppressed"],
         "fact_sent": result["fact"]
     }
+    if sampler is not None:
+        response["profile"] = sampler.path
+    return response
+
+
+@app.post("/api/email/webhook")
+async def email_webhook(
+    request: Request,
+    secret: Optional[str] = Query(None, description="Secret key, if Svix signing is not configured"),
+):
+    """
+    Ingest provider bounce/complaint events (one event or a JSON array) into the
+    suppression table. Authenticated by the Resend/Svix signature when
+    RESEND_WEBHOOK_SECRET is set, otherwise by the admin secret.
+    """
+    body = await request.body()
+    if RESEND_WEBHOOK_SECRET:
+        if not verify_signature(body, request.headers):
+            raise HTTPException(status_code=403, detail="Invalid signature")
+    else:
+        check_admin_secret(secret)
+
+    try:
+        payload = json.loads(body or b"null")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    events = payload if isinstance(payload, list) else [payload]
+    events = [event for event in events if isinstance(event, dict)]
+
+    suppressed = record_events(events)
+    return {"success": True, "received": len(events), "suppressed": suppressed}
 
 
 @app.get("/unsubscribe")
 def unsubscribe_page(request: Request, email: Optional[str] = None):
     """Show unsubscribe page."""
-    return templates.TemplateResponse("unsubscribe.html", {
+    return templates().TemplateResponse("unsubscribe.html", {
         "request": request, 
         "email": email or ""
     })
@@ -1,5 +1,6 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
+from sqlalchemy import Column, Index, LargeBinary
 from sqlmodel import SQLModel, Field, UniqueConstraint
 
 class Subscriber(SQLModel, table=True):
@@ -11,5 +12,63 @@ class Subscriber(SQLModel, table=True):
     nba: bool = Field(default=False)
     mlb: bool = Field(default=False)
     nhl: bool = Field(default=False)
+    # IANA zone name for local-morning delivery; None means UTC
+    timezone: Optional[str] = Field(default="UTC", index=True)
+    # Local date of the last daily email, so each slot only picks up who is still due
+    last_sent_on: Optional[date] = Field(default=None)
+    # Local date and count of today's failed attempts, for capping retries
+    failed_on: Optional[date] = Field(default=None)
+    failed_attempts: Optional[int] = Field(default=None)
+    # Rolling history of facts already sent, as packed little-endian uint32 keys
+    seen_facts: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary, nullable=True))
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
     updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+
+class Fact(SQLModel, table=True):
+    """Every generated fact, kept for history queries and as an offline fallback."""
+    __tablename__ = "facts"
+    __table_args__ = (Index("ix_facts_sport_created_at", "sport", "created_at", "id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    sport: str
+    text: str
+    fields_hash: str = Field(index=True)
+    fields_json: str = ""
+    model: str = ""
+    llm: bool = Field(default=False)
+    latency_ms: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
+
+
+class Suppression(SQLModel, table=True):
+    """Addresses that hard-bounced or complained; daily sends skip them."""
+    __tablename__ = "suppressions"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    email: str = Field(index=True, unique=True)
+    reason: str
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+
+class Lease(SQLModel, table=True):
+    """A named, expiring lock in the database so only one worker runs a job at a time."""
+    __tablename__ = "leases"
+
+    name: str = Field(primary_key=True)
+    holder: str
+    expires_at: datetime = Field(nullable=False)
+
+
+class FactOfTheDay(SQLModel, table=True):
+    """The one fact shown (and emailed) for a sport on a given UTC date."""
+    __tablename__ = "fact_of_the_day"
+    __table_args__ = (UniqueConstraint("sport", "day"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    sport: str
+    day: date
+    fact_id: Optional[int] = Field(default=None)
+    text: str
+    llm: bool = Field(default=False)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
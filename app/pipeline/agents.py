@@ -1,102 +1,98 @@
 # app/pipeline/agents.py
-from typing import Optional
-from datetime import datetime
-
-def normalize_name(city: Optional[str], name: Optional[str]) -> str:
-    city = (city or "").strip()
-    name = (name or "").strip()
-    if city and name:
-        return f"{city} {name}"
-    return city or name or "Unknown Team"
-
-def clean_division(name: Optional[str]) -> Optional[str]:
-    if not name:
-        return None
-    return name.replace("Division", "").strip()
-
-def pretty_year(y: Optional[str]) -> Optional[str]:
-    # MLB/NHL return strings like "1969"
-    if not y:
-        return None
-    try:
-        int(y)
-        return y
-    except ValueError:
-        return None
-
-def render_mlb_fact(fields: dict) -> str:
+from typing import Mapping
+
+from app.pipeline.records import (  # noqa: F401  (helpers re-exported for older imports)
+    MlbTeamFact, NbaLeaderFact, STAT_NAMES, as_record, clean_division, normalize_name, pretty_year,
+)
+
+def ordinal(n: int) -> str:
+    if 10 <= n % 100 <= 20:
+        suffix = "th"
+    else:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+def render_mlb_fact(fact: MlbTeamFact) -> str:
     """
-    Build a short, readable MLB fact from fields.
+    Build a short, readable MLB fact from a team record.
     Tries to include venue/division/year/league when present.
     """
-    team = normalize_name(fields.get("team_city"), fields.get("team_name"))
-    sport = (fields.get("sport") or "").upper()
+    team = fact.team
 
-    venue = fields.get("venue")
-    if venue:
-        return f"⚾ The {team} have played at {venue} since their founding ({sport})."
+    if fact.fact_type == "founding_rank" and fact.first_year:
+        rank = fact.founding_rank or 1
+        order = fact.founding_order or "oldest"
+        place = f"{ordinal(rank)}-{order}" if rank > 1 else order
+        return f"⚾ Founded in {fact.first_year}, the {team} are MLB's {place} franchise."
 
-    first_year = pretty_year(fields.get("first_year"))
-    if first_year:
-        return f"⚾ The {team} were founded in {first_year} and are one of MLB's historic franchises."
+    if fact.venue:
+        return f"⚾ The {team} have played at {fact.venue} since their founding (MLB)."
 
-    division = clean_division(fields.get("division"))
+    if fact.first_year:
+        return f"⚾ The {team} were founded in {fact.first_year} and are one of MLB's historic franchises."
+
+    division = fact.division_short
     if division:
-        return f"⚾ The {team} compete in the {division} Division ({sport})."
+        return f"⚾ The {team} compete in the {division} Division (MLB)."
 
-    league = fields.get("league")
-    if league:
-        return f"⚾ The {team} compete in {league} ({sport})."
+    if fact.league:
+        return f"⚾ The {team} compete in {fact.league} (MLB)."
 
-    return f"⚾ The {team} ({sport})."
+    return f"⚾ The {team} (MLB)."
 
 
-def render_nba_fact(fields: dict) -> str:
+def render_nba_fact(fact: NbaLeaderFact) -> str:
     """
-    Build a short, readable NBA fact from fields.
+    Build a short, readable NBA fact from a leader record.
     Handles career leaders from real NBA API data.
     """
-    fact_type = fields.get("fact_type")
-    player_name = fields.get("player_name", "an NBA player")
+    fact_type = fact.fact_type
+    player_name = fact.player_name or "an NBA player"
+    stat_name = fact.stat_name
+
+    if fact_type == "rank_gap":
+        return (
+            f"🏀 {player_name} sits #{fact.rank} in NBA history for career {stat_name}, "
+            f"{fact.gap or 0:,} ahead of {fact.next_player}."
+        )
+
+    elif fact_type == "milestone":
+        return (
+            f"🏀 {player_name} is just {fact.to_go or 0:,} {stat_name} away from "
+            f"{fact.milestone or 0:,} career {stat_name}."
+        )
+
+    elif fact_type == "chase":
+        target = "the all-time record" if fact.target_rank == 1 else f"#{fact.target_rank} all-time"
+        return (
+            f"🏀 {player_name} needs {fact.to_go or 0:,} more career {stat_name} to pass "
+            f"{fact.target_player} for {target}."
+        )
     
-    if fact_type == "career_leader":
-        category = fields.get("category", "stats")
-        rank = fields.get("rank", 0)
-        value = fields.get("value", "")
-        active = fields.get("active", False)
+    elif fact_type == "career_leader":
+        value = fact.value if fact.value is not None else ""
+        active_text = " (still active)" if fact.active else ""
         
-        stat_names = {
-            "PTS": "points",
-            "REB": "rebounds", 
-            "AST": "assists",
-            "STL": "steals",
-            "BLK": "blocks",
-        }
-        stat_name = stat_names.get(category, category)
-        
-        active_text = " (still active)" if active else ""
-        
-        if rank == 1:
+        if fact.rank == 1:
             return f"🏀 {player_name} is the NBA's all-time leader in {stat_name} with {value} career {stat_name}{active_text}."
         else:
-            return f"🏀 {player_name} ranks #{rank} in NBA history for career {stat_name} with {value} {stat_name}{active_text}."
-    
-    elif fact_type == "error":
-        return f"🏀 Unable to fetch NBA data at this moment. Please try again!"
+            return f"🏀 {player_name} ranks #{fact.rank} in NBA history for career {stat_name} with {value} {stat_name}{active_text}."
     
     else:
         return f"🏀 NBA - where amazing happens! Home to the world's greatest basketball players."
 
 
-def render_blurb(fields: dict) -> str:
+def render_blurb(fields: Mapping) -> str:
     """
-    Build a fact based on sport type.
+    Build a fact based on sport type. Accepts a record or an old-style field dict.
     """
-    sport = fields.get("sport", "").lower()
-    
-    if sport == "nba":
-        return render_nba_fact(fields)
-    elif sport == "mlb":
-        return render_mlb_fact(fields)
+    fact = as_record(fields)
+
+    if isinstance(fact, NbaLeaderFact):
+        return render_nba_fact(fact)
+    elif isinstance(fact, MlbTeamFact):
+        return render_mlb_fact(fact)
+    elif (fields.get("sport") or "").lower() == "nba" and fields.get("fact_type") == "error":
+        return f"🏀 Unable to fetch NBA data at this moment. Please try again!"
     else:
         return "Sports fact coming soon!"
@@ -1,82 +1,106 @@
 # app/pipeline/fetchers.py
+import asyncio
+import os
 import random
-import httpx
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Mapping, Optional, Set, Tuple, Union
 
-TIMEOUT = httpx.Timeout(10.0, connect=6.0)
+from app.executors import run_in
+from app.pipeline.records import MlbTeamFact, NbaLeaderFact
+
+# (read, connect) seconds; httpx itself is imported on the first fetch, not at startup
+TIMEOUT = (10.0, 6.0)
 HEADERS = {"User-Agent": "sports-facts-mvp/0.1"}
 
 async def _get_json(url: str):
-    async with httpx.AsyncClient(timeout=TIMEOUT, headers=HEADERS, http2=False) as client:
+    import httpx
+    timeout = httpx.Timeout(TIMEOUT[0], connect=TIMEOUT[1])
+    async with httpx.AsyncClient(timeout=timeout, headers=HEADERS, http2=False) as client:
         r = await client.get(url)
         r.raise_for_status()
         return r.json()
 
 # ---------- MLB (StatsAPI, no key) ----------
-async def fetch_mlb_sample():
+async def _fetch_mlb_teams() -> List[Dict[str, Any]]:
     data = await _get_json("https://statsapi.mlb.com/api/v1/teams?sportId=1")
-    teams = data.get("teams", []) or []
-    team = random.choice(teams)
+    return data.get("teams", []) or []
+
 
-    venue = (team.get("venue") or {}).get("name")
+async def fetch_mlb_sample() -> MlbTeamFact:
+    teams = await _fetch_mlb_teams()
+    return MlbTeamFact.from_api(random.choice(teams))
 
-    return {
-        "sport": "mlb",
-        "fact_type": "team_info",
-        "team_city": team.get("locationName"),
-        "team_name": team.get("teamName"),
-        "abbrev": team.get("abbreviation"),
-        "first_year": team.get("firstYearOfPlay"),
-        "league": (team.get("league") or {}).get("name"),
-        "division": (team.get("division") or {}).get("name"),
-        "venue": venue,
-    }
+
+async def fetch_mlb_batch(n: int) -> List[MlbTeamFact]:
+    """
+    Fetch the teams list once and return up to n distinct team records.
+    """
+    teams = await _fetch_mlb_teams()
+    picks = random.sample(teams, min(n, len(teams)))
+    return [MlbTeamFact.from_api(team) for team in picks]
 
 
 # ---------- NBA (nba_api package - REAL DATA ONLY) ----------
-def fetch_nba_sample_sync() -> Dict[str, Any]:
+# Career leader categories and their index in the AllTimeLeadersGrids result sets
+NBA_STAT_MAPPING = {
+    "PTS": 1,   # Points leaders
+    "AST": 2,   # Assists leaders
+    "REB": 6,   # Rebounds leaders
+    "STL": 3,   # Steals leaders
+    "BLK": 7,   # Blocks leaders
+}
+
+
+def fetch_nba_leader_sets(topx: int = 10) -> List[Dict[str, Any]]:
+    """
+    Raw result sets of the all-time leaders grid, each {"name", "headers", "rowSet"}.
+    Goes through nba_api's HTTP layer directly: the endpoint classes import
+    pandas and build a DataFrame per result set, which we never need.
+    """
+    from nba_api.stats.library.http import NBAStatsHTTP
+
+    response = NBAStatsHTTP().send_api_request(
+        endpoint="alltimeleadersgrids",
+        parameters={
+            "LeagueID": "00",
+            "PerMode": "Totals",
+            "SeasonType": "Regular Season",
+            "TopX": topx,
+        },
+        timeout=30,
+    )
+    return response.get_dict()["resultSets"]
+
+
+def _nba_fields(stat_type: str, headers: List[str], row: List[Any]) -> NbaLeaderFact:
+    leader = dict(zip(headers, row))
+    return NbaLeaderFact(
+        category=stat_type,
+        player_name=leader.get("PLAYER_NAME"),
+        rank=leader.get(f"{stat_type}_RANK") or 0,
+        value=leader.get(stat_type),
+        active=leader.get("IS_ACTIVE_FLAG") == "Y",
+    )
+
+
+def fetch_nba_sample_sync() -> Union[NbaLeaderFact, Dict[str, Any]]:
     """
     Synchronous NBA data fetcher using nba_api.
     Returns ONLY real data from NBA API - no hardcoded facts.
     """
     try:
-        from nba_api.stats.endpoints import alltimeleadersgrids
-        
         # Only use real API data - get career leaders from various categories
-        stat_mapping = {
-            "PTS": 1,   # Points leaders
-            "AST": 2,   # Assists leaders  
-            "REB": 6,   # Rebounds leaders
-            "STL": 3,   # Steals leaders
-            "BLK": 7,   # Blocks leaders
-        }
-        stat_type = random.choice(list(stat_mapping.keys()))
-        df_index = stat_mapping[stat_type]
-        
-        leaders = alltimeleadersgrids.AllTimeLeadersGrids(
-            league_id="00",
-            season_type="Regular Season",
-            per_mode_simple="Totals",
-            topx=10
-        )
-        
-        # Get the correct dataframe for this stat type
-        all_dfs = leaders.get_data_frames()
-        if df_index < len(all_dfs):
-            df = all_dfs[df_index]
-            if not df.empty:
+        stat_type = random.choice(list(NBA_STAT_MAPPING.keys()))
+        index = NBA_STAT_MAPPING[stat_type]
+
+        # Get the result set for this stat type
+        result_sets = fetch_nba_leader_sets()
+        if index < len(result_sets):
+            result_set = result_sets[index]
+            if result_set["rowSet"]:
                 # Pick a random leader from top 10
-                leader = df.sample(1).iloc[0]
-                rank_col = f"{stat_type}_RANK"
-                return {
-                    "sport": "nba",
-                    "fact_type": "career_leader",
-                    "category": stat_type,
-                    "player_name": leader.get('PLAYER_NAME'),
-                    "rank": int(leader.get(rank_col, 0)),
-                    "value": leader.get(stat_type),
-                    "active": leader.get('IS_ACTIVE_FLAG') == 'Y',
-                }
+                row = random.choice(result_set["rowSet"])
+                return _nba_fields(stat_type, result_set["headers"], row)
         
         # If API fails or returns empty, return None to trigger error handling
         return {
@@ -94,29 +118,161 @@ def fetch_nba_sample_sync() -> Dict[str, Any]:
         }
 
 
-async def fetch_nba_sample() -> Dict[str, Any]:
+def fetch_nba_batch_sync(n: int) -> List[NbaLeaderFact]:
+    """
+    Fetch the leaders grid once and return up to n distinct leader records
+    drawn from all categories. Raises if the upstream call fails.
+    """
+    result_sets = fetch_nba_leader_sets()
+    records = []
+    for stat_type, index in NBA_STAT_MAPPING.items():
+        if index >= len(result_sets):
+            continue
+        headers = result_sets[index]["headers"]
+        for row in result_sets[index]["rowSet"]:
+            records.append(_nba_fields(stat_type, headers, row))
+    return random.sample(records, min(n, len(records)))
+
+
+async def fetch_nba_sample() -> Union[NbaLeaderFact, Dict[str, Any]]:
     """
-    Async wrapper for NBA data fetching.
+    Async wrapper for NBA data fetching, on the dedicated nba_api executor.
     """
-    import asyncio
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, fetch_nba_sample_sync)
+    return await run_in("nba_api", fetch_nba_sample_sync)
+
+
+async def fetch_nba_batch(n: int) -> List[NbaLeaderFact]:
+    """
+    Async wrapper for NBA batch fetching, on the dedicated nba_api executor.
+    """
+    return await run_in("nba_api", fetch_nba_batch_sync, n)
 
 
 # ---------- Main Fetch Router ----------
-async def fetch_sport_sample(sport: Optional[str] = None) -> Dict[str, Any]:
+SPORTS = ("mlb", "nba")
+
+# Random-sport requests start a second sport's fetch if the first has not
+# answered within FETCH_HEDGE_MS (0 starts both at once). The request takes
+# whichever usable record arrives first; the other fetch is not waited for,
+# and its record is kept in _warm for up to FETCH_WARM_TTL seconds and served
+# (once) to the next request for that sport.
+FETCH_HEDGE_MS = int(os.getenv("FETCH_HEDGE_MS", "150"))
+FETCH_WARM_TTL = int(os.getenv("FETCH_WARM_TTL", "600"))
+
+_warm: Dict[str, Tuple[float, Mapping[str, Any]]] = {}
+# Losing fetches still running, referenced until they finish
+_losers: Set[asyncio.Future] = set()
+hedge_stats = {"random": 0, "hedged": 0, "hedge_won": 0, "warmed": 0, "warm_served": 0}
+
+
+def _usable(fields: Optional[Mapping[str, Any]]) -> bool:
+    return bool(fields) and fields.get("fact_type") != "error"
+
+
+def _take_warm(sport: str) -> Optional[Mapping[str, Any]]:
+    entry = _warm.pop(sport, None)
+    if entry is None or time.monotonic() - entry[0] > FETCH_WARM_TTL:
+        return None
+    hedge_stats["warm_served"] += 1
+    return entry[1]
+
+
+def _keep_warm(sport: str, task: asyncio.Future):
+    """Store the record `task` produces (now or when it finishes) as `sport`'s warm record."""
+    def store(done: asyncio.Future):
+        _losers.discard(done)
+        if done.cancelled() or done.exception() is not None:
+            return
+        fields = done.result()
+        if _usable(fields):
+            _warm[sport] = (time.monotonic(), fields)
+            hedge_stats["warmed"] += 1
+
+    if task.done():
+        store(task)
+    else:
+        _losers.add(task)
+        task.add_done_callback(store)
+
+
+async def _sample_one(sport: str) -> Mapping[str, Any]:
+    """A warehouse candidate, else a warm record left by a hedged fetch, else a live fetch."""
+    from app.pipeline.warehouse import warehouse
+    fields = warehouse.sample(sport)
+    if fields:
+        return fields
+    fields = _take_warm(sport)
+    if fields is not None:
+        return fields
+    if sport == "mlb":
+        return await fetch_mlb_sample()
+    return await fetch_nba_sample()
+
+
+def _result(task: asyncio.Future) -> Optional[Mapping[str, Any]]:
+    return task.result() if task.exception() is None else None
+
+
+async def fetch_random_sample() -> Mapping[str, Any]:
     """
-    Fetch sample data for specified sport or random if not specified.
+    A record for a random sport, hedged across sports: a slow or failing first
+    pick does not hold the request while the other sport can answer.
     """
-    if sport is None:
+    hedge_stats["random"] += 1
+    first, second = random.sample(SPORTS, 2)
+    primary = asyncio.ensure_future(_sample_one(first))
+    tasks = {primary: first}
+    winner = None
+    try:
+        await asyncio.wait({primary}, timeout=FETCH_HEDGE_MS / 1000)
+        if primary.done() and _usable(_result(primary)):
+            winner = primary
+            return primary.result()
+
+        hedge_stats["hedged"] += 1
+        tasks[asyncio.ensure_future(_sample_one(second))] = second
+        pending = {task for task in tasks if not task.done()}
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if _usable(_result(task))), None)
+
+        if winner is None:
+            # Both failed: report the first pick's error, as a single fetch would
+            winner = primary
+            return primary.result()
+        if winner is not primary:
+            hedge_stats["hedge_won"] += 1
+        return winner.result()
+    finally:
+        for task, sport in tasks.items():
+            if task is not winner:
+                _keep_warm(sport, task)
+
+
+async def fetch_sport_sample(sport: Optional[str] = None) -> Mapping[str, Any]:
+    """
+    Fetch sample data for specified sport or random if not specified
+    (random requests are hedged across sports, see fetch_random_sample).
+    """
+    sport = (sport or "").lower()
+    if sport not in SPORTS:
+        return await fetch_random_sample()
+    return await _sample_one(sport)
+
+
+async def fetch_sport_batch(sport: Optional[str], n: int) -> List[Mapping[str, Any]]:
+    """
+    Fetch up to n distinct records for one sport with a single upstream call.
+    """
+    sport = (sport or "").lower()
+    if sport not in ("mlb", "nba"):
         sport = random.choice(["mlb", "nba"])
-    
-    sport = sport.lower()
-    
+
+    from app.pipeline.warehouse import warehouse
+    records = warehouse.sample_many(sport, n)
+    if len(records) >= n:
+        return records
+
     if sport == "mlb":
-        return await fetch_mlb_sample()
-    elif sport == "nba":
-        return await fetch_nba_sample()
-    else:
-        # Default to random
-        return await fetch_sport_sample(random.choice(["mlb", "nba"]))
+        return await fetch_mlb_batch(n)
+    return await fetch_nba_batch(n)
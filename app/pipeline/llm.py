@@ -1,8 +1,12 @@
 # app/pipeline/llm.py
 import os
+import re
 import json
-import requests
-from typing import Dict, Optional
+import asyncio
+from typing import Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from app.pipeline.records import MlbTeamFact, NbaLeaderFact, as_record
+from app.pipeline.router import ModelRouter, RouteResult
 # ------------------------------------------------------------
 # CONFIG
 # ------------------------------------------------------------
@@ -12,46 +16,99 @@ MODEL = os.getenv("OPENROUTER_MODEL", "liquid/lfm-2.5-1.2b-thinking:free")
 SITE_URL = os.getenv("OPENROUTER_SITE_URL", "http://localhost:8000")
 APP_TITLE = os.getenv("OPENROUTER_APP_NAME", "Sports Facts")
 
-_cache: Dict[str, str] = {}
+# Candidate models for the router (comma-separated); defaults to MODEL alone.
+# OPENROUTER_HEDGE_MS > 0 starts the runner-up model if the first is that slow.
+MODELS = [m.strip() for m in os.getenv("OPENROUTER_MODELS", MODEL).split(",") if m.strip()]
+HEDGE_MS = int(os.getenv("OPENROUTER_HEDGE_MS", "0"))
+# (read, connect) seconds; httpx is imported on the first call, not at startup
+TIMEOUT = (20.0, 6.0)
+
+# Batched compose: how many records go into one request, and its token budget
+BATCH_SIZE = int(os.getenv("OPENROUTER_BATCH_SIZE", "8"))
+BATCH_BASE_TOKENS = 1000
+BATCH_TOKENS_PER_FACT = 80
+
+# Per-endpoint LLM latency budgets in ms (0 = wait for the LLM). Past the deadline
+# callers serve render_blurb while the call finishes in the background and
+# backfills _cache for the next request with the same prompt.
+LLM_BUDGETS_MS = {
+    "generate": int(os.getenv("LLM_BUDGET_GENERATE_MS", "800")),
+    "batch": int(os.getenv("LLM_BUDGET_BATCH_MS", "3000")),
+    "email": int(os.getenv("LLM_BUDGET_EMAIL_MS", "0")),
+}
+
+
+
+class _Composed(NamedTuple):
+    """A cached sentence and the call that produced it, so cache hits archive the real model."""
+    text: str
+    model: str
+    latency_ms: int
+
+
+_cache: Dict[str, _Composed] = {}
+# Calls still running, keyed by prompt, so late requests join them instead of
+# starting another (this also keeps background tasks referenced until done)
+_inflight: Dict[str, asyncio.Future] = {}
+
+router = ModelRouter(MODELS, hedge_after=HEDGE_MS / 1000 if HEDGE_MS > 0 else None)
 
 # ------------------------------------------------------------
 # BUILD PROMPT
 # ------------------------------------------------------------
-def _prompt_from_fields(fields: Dict) -> str:
-    sport = (fields.get("sport") or "").lower()
-    
-    if sport == "nba":
-        return _prompt_nba(fields)
-    elif sport == "mlb":
-        return _prompt_mlb(fields)
+def _prompt_from_fields(fields: Mapping) -> str:
+    fact = as_record(fields)
+
+    if isinstance(fact, NbaLeaderFact):
+        return _prompt_nba(fact)
+    elif isinstance(fact, MlbTeamFact):
+        return _prompt_mlb(fact)
     else:
         return _prompt_generic(fields)
 
 
-def _prompt_nba(fields: Dict) -> str:
-    """Build prompt for NBA facts."""
-    fact_type = fields.get("fact_type", "")
-    player_name = fields.get("player_name", "")
-    category = fields.get("category", "")
-    rank = fields.get("rank", 0)
-    value = fields.get("value", "")
-    
-    stat_names = {
-        "PTS": "points",
-        "REB": "rebounds", 
-        "AST": "assists",
-        "STL": "steals",
-        "BLK": "blocks",
-    }
-    stat_name = stat_names.get(category, category)
-    
+def _context_from_fields(fields: Mapping) -> str:
+    fact = as_record(fields)
+
+    if isinstance(fact, NbaLeaderFact):
+        return _context_nba(fact)
+    elif isinstance(fact, MlbTeamFact):
+        return _context_mlb(fact)
+    else:
+        return "Sport: unknown\n"
+
+
+def _context_nba(fact: NbaLeaderFact) -> str:
+    """Data block for NBA facts."""
+    value = fact.value if fact.value is not None else ""
     context = (
         f"Sport: NBA\n"
-        f"Player: {player_name}\n"
-        f"Statistic: {stat_name}\n"
-        f"Rank: #{rank}\n"
+        f"Player: {fact.player_name or ''}\n"
+        f"Statistic: {fact.stat_name}\n"
+        f"Rank: #{fact.rank}\n"
         f"Value: {value}\n"
     )
+    if fact.fact_type == "rank_gap":
+        context += (
+            f"Next player down: {fact.next_player or ''}\n"
+            f"Lead over next player: {fact.gap}\n"
+        )
+    elif fact.fact_type == "milestone":
+        context += (
+            f"Next milestone: {fact.milestone}\n"
+            f"Still needed: {fact.to_go}\n"
+        )
+    elif fact.fact_type == "chase":
+        context += (
+            f"Player to pass: {fact.target_player or ''} (#{fact.target_rank})\n"
+            f"Still needed to pass: {fact.to_go}\n"
+        )
+    return context
+
+
+def _prompt_nba(fact: NbaLeaderFact) -> str:
+    """Build prompt for NBA facts."""
+    context = _context_nba(fact)
     
     return (
         "You are a concise sports fact writer. "
@@ -62,26 +119,29 @@ def _prompt_nba(fields: Dict) -> str:
     )
 
 
-def _prompt_mlb(fields: Dict) -> str:
-    """Build prompt for MLB facts."""
-    team_city = (fields.get("team_city") or "").strip()
-    team_name = (fields.get("team_name") or "").strip()
-    venue = (fields.get("venue") or "").strip()
-    division = (fields.get("division") or "").strip()
-    league = (fields.get("league") or "").strip()
-    first_year = (fields.get("first_year") or "").strip()
-    abbr = (fields.get("abbrev") or "").strip()
-
+def _context_mlb(fact: MlbTeamFact) -> str:
+    """Data block for MLB facts."""
     context = (
         f"Sport: MLB\n"
-        f"City: {team_city}\n"
-        f"Team: {team_name}\n"
-        f"Abbrev: {abbr}\n"
-        f"League: {league}\n"
-        f"Division: {division}\n"
-        f"Venue: {venue}\n"
-        f"Founded: {first_year}\n"
+        f"City: {fact.team_city or ''}\n"
+        f"Team: {fact.team_name or ''}\n"
+        f"Abbrev: {fact.abbrev or ''}\n"
+        f"League: {fact.league or ''}\n"
+        f"Division: {fact.division or ''}\n"
+        f"Venue: {fact.venue or ''}\n"
+        f"Founded: {fact.first_year or ''}\n"
     )
+    if fact.fact_type == "founding_rank":
+        context += (
+            f"Founding order: #{fact.founding_rank} "
+            f"{fact.founding_order} of {fact.team_count} teams\n"
+        )
+    return context
+
+
+def _prompt_mlb(fact: MlbTeamFact) -> str:
+    """Build prompt for MLB facts."""
+    context = _context_mlb(fact)
 
     return (
         "You are a concise sports fact writer. "
@@ -93,7 +153,7 @@ def _prompt_mlb(fields: Dict) -> str:
     )
 
 
-def _prompt_generic(fields: Dict) -> str:
+def _prompt_generic(fields: Mapping) -> str:
     """Generic prompt for any sport."""
     return (
         "You are a concise sports fact writer. "
@@ -102,18 +162,92 @@ def _prompt_generic(fields: Dict) -> str:
         "Do NOT output anything except the sentence.\n"
     )
 
+def _prompt_batch(fields_list: List[Mapping]) -> str:
+    """Pack several records into one prompt that asks for a JSON array back."""
+    records = "\n".join(
+        f"Record {i}:\n{_context_from_fields(fields)}"
+        for i, fields in enumerate(fields_list, 1)
+    )
+    return (
+        "You are a concise sports fact writer. "
+        "For EACH record below, using ONLY that record's data, write ONE short, factual sentence. "
+        "Keep each sentence under 25 words and mention the player or team by name. "
+        f"Output ONLY a JSON array of exactly {len(fields_list)} strings, in record order, "
+        "with no other text.\n\n"
+        f"{records}"
+    )
+
+# ------------------------------------------------------------
+# VALIDATE
+# ------------------------------------------------------------
+_NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def _numbers_in(value) -> Set[str]:
+    if isinstance(value, bool) or value is None:
+        return set()
+    if isinstance(value, (int, float)) or hasattr(value, "__index__"):
+        number = float(value)
+        return {str(int(number)) if number.is_integer() else str(number)}
+    return {n.replace(",", "") for n in _NUMBER_RE.findall(str(value))}
+
+
+def _anchor(fields: Mapping) -> str:
+    fact = as_record(fields)
+    if isinstance(fact, NbaLeaderFact):
+        return (fact.player_name or "").split(" ")[-1]
+    if isinstance(fact, MlbTeamFact):
+        return fact.team_name or ""
+    return ""
+
+
+def validate_sentence(sentence: str, fields: Mapping) -> bool:
+    """
+    Reject sentences that drift from their source record: the player/team must be
+    named and every figure quoted must come from the fields (small counts aside).
+    """
+    if not sentence or len(sentence) > 300:
+        return False
+    anchor = _anchor(fields)
+    if anchor and anchor.lower() not in sentence.lower():
+        return False
+    allowed: Set[str] = set()
+    for value in fields.values():
+        allowed |= _numbers_in(value)
+    for number in _NUMBER_RE.findall(sentence):
+        number = number.replace(",", "").rstrip(".")
+        if number not in allowed and not (number.isdigit() and int(number) <= 10):
+            return False
+    return True
+
+
+def _parse_sentence_array(text: str, n: int) -> List[Optional[str]]:
+    """Pull the JSON array of sentences out of a model reply, padded to n items."""
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return [None] * n
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return [None] * n
+    if not isinstance(items, list):
+        return [None] * n
+    sentences = [item.strip() if isinstance(item, str) and item.strip() else None for item in items[:n]]
+    return sentences + [None] * (n - len(sentences))
+
+
+def _finish(text: str) -> str:
+    return text if text.endswith(".") else text + "."
+
 # ------------------------------------------------------------
 # CALL OPENROUTER
 # ------------------------------------------------------------
-def compose_fact(fields: Dict) -> Optional[str]:
-    """Compose a fact using OpenRouter's chat completions API."""
-    if not OPENROUTER_API_KEY or OPENROUTER_API_KEY.startswith("PUT_YOUR_KEY"):
-        return None
+def _is_configured() -> bool:
+    return bool(OPENROUTER_API_KEY) and not OPENROUTER_API_KEY.startswith("PUT_YOUR_KEY")
 
-    prompt = _prompt_from_fields(fields)
-    if prompt in _cache:
-        return _cache[prompt]
 
+async def _complete(prompt: str, max_tokens: int, model: str) -> str:
+    """One chat completion against `model`; raises on HTTP errors or empty content."""
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
         "Content-Type": "application/json",
@@ -122,7 +256,7 @@ def compose_fact(fields: Dict) -> Optional[str]:
     }
 
     payload = {
-        "model": MODEL,
+        "model": model,
         "messages": [
             {
                 "role": "user",
@@ -130,30 +264,139 @@ def compose_fact(fields: Dict) -> Optional[str]:
             }
         ],
         "temperature": 0.7,
-        "max_tokens": 1000,  # High limit - model uses many tokens for reasoning before content
+        "max_tokens": max_tokens,
     }
 
-    try:
-        resp = requests.post(
-            url=OPENROUTER_URL,
-            headers=headers,
-            data=json.dumps(payload),
-            timeout=20,
-        )
+    import httpx
+    async with httpx.AsyncClient(timeout=httpx.Timeout(TIMEOUT[0], connect=TIMEOUT[1])) as client:
+        resp = await client.post(OPENROUTER_URL, headers=headers, json=payload)
         resp.raise_for_status()
         data = resp.json()
-        text = (
-            data.get("choices", [{}])[0]
-                .get("message", {})
-                .get("content", "")
-                .strip()
-        )
-        if not text:
-            return None
-        if not text.endswith("."):
-            text += "."
-        _cache[prompt] = text
-        return text
-    except Exception as e:
-        print("OpenRouter call failed:", e)
+    text = (
+        (data.get("choices", [{}])[0]
+            .get("message", {})
+            .get("content") or "")
+            .strip()
+    )
+    if not text:
+        raise ValueError(f"empty completion from {model}")
+    return text
+
+
+def _join_or_start(prompt: str, make) -> asyncio.Future:
+    task = _inflight.get(prompt)
+    if task is None:
+        task = asyncio.ensure_future(make())
+        _inflight[prompt] = task
+        task.add_done_callback(lambda _: _inflight.pop(prompt, None))
+    return task
+
+
+async def _within(task: asyncio.Future, budget_ms: int):
+    """Wait for `task` up to budget_ms without cancelling it; None if the deadline passed."""
+    if budget_ms <= 0:
+        return await asyncio.shield(task)
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), budget_ms / 1000)
+    except asyncio.TimeoutError:
         return None
+
+
+def _deadline_result(budget_ms: int) -> RouteResult:
+    return RouteResult(None, "", f"deadline: no answer within {budget_ms}ms, finishing in background", budget_ms)
+
+
+async def _compose_prompt(prompt: str) -> RouteResult:
+    # High limit - model uses many tokens for reasoning before content
+    result = await router.run(lambda model: _complete(prompt, 1000, model))
+    if not result.text:
+        return result
+    text = _finish(result.text)
+    _cache[prompt] = _Composed(text, result.model, result.latency_ms)
+    return result._replace(text=text)
+
+
+async def compose_fact_routed(fields: Mapping, budget_ms: int = 0) -> RouteResult:
+    """
+    Compose a fact and report which model produced it, and why that model was picked.
+    With a budget, gives up waiting after budget_ms and lets the call backfill the cache.
+    """
+    if not _is_configured():
+        return RouteResult(None, "", "OPENROUTER_API_KEY not set", 0)
+
+    prompt = _prompt_from_fields(fields)
+    cached = _cache.get(prompt)
+    if cached is not None:
+        return RouteResult(cached.text, cached.model, "prompt already composed", cached.latency_ms)
+
+    task = _join_or_start(prompt, lambda: _compose_prompt(prompt))
+    result = await _within(task, budget_ms)
+    return result if result is not None else _deadline_result(budget_ms)
+
+
+async def compose_fact(fields: Mapping) -> Optional[str]:
+    """Compose a fact using OpenRouter's chat completions API."""
+    return (await compose_fact_routed(fields)).text
+
+
+async def _compose_batch(batch: List[Mapping], prompts: List[str]) -> Tuple[List[Optional[str]], RouteResult]:
+    batch_prompt = _prompt_batch(batch)
+    # Reasoning overhead is paid once per request, so the budget grows slowly per record
+    max_tokens = BATCH_BASE_TOKENS + BATCH_TOKENS_PER_FACT * len(batch)
+    route = await router.run(lambda model: _complete(batch_prompt, max_tokens, model))
+    sentences: List[Optional[str]] = [None] * len(batch)
+    if not route.text:
+        return sentences, route
+
+    for i, sentence in enumerate(_parse_sentence_array(route.text, len(batch))):
+        if sentence and validate_sentence(sentence, batch[i]):
+            sentence = _finish(sentence)
+            _cache[prompts[i]] = _Composed(sentence, route.model, route.latency_ms)
+            sentences[i] = sentence
+    return sentences, route
+
+
+async def compose_facts_routed(
+    fields_list: List[Mapping], budget_ms: int = 0
+) -> Tuple[List[Optional[str]], RouteResult]:
+    """
+    Compose several facts with a single OpenRouter request.
+
+    Returns one entry per record; an entry is None when the model skipped it, its
+    sentence failed validation or the budget ran out, so callers fall back to
+    render_blurb per item.
+    """
+    results: List[Optional[str]] = [None] * len(fields_list)
+    if not _is_configured():
+        return results, RouteResult(None, "", "OPENROUTER_API_KEY not set", 0)
+
+    prompts = [_prompt_from_fields(fields) for fields in fields_list]
+    pending = []
+    hit = None
+    for i, prompt in enumerate(prompts):
+        cached = _cache.get(prompt)
+        if cached is not None:
+            results[i] = cached.text
+            hit = hit or cached
+        else:
+            pending.append(i)
+    if not pending:
+        if hit is None:
+            return results, RouteResult(None, "", "nothing to compose", 0)
+        return results, RouteResult(None, hit.model, "prompts already composed", hit.latency_ms)
+
+    batch = [fields_list[i] for i in pending]
+    batch_prompts = [prompts[i] for i in pending]
+    task = _join_or_start(_prompt_batch(batch), lambda: _compose_batch(batch, batch_prompts))
+    outcome = await _within(task, budget_ms)
+    if outcome is None:
+        return results, _deadline_result(budget_ms)
+
+    sentences, route = outcome
+    for i, sentence in zip(pending, sentences):
+        results[i] = sentence
+    return results, route
+
+
+async def compose_facts(fields_list: List[Mapping]) -> List[Optional[str]]:
+    return (await compose_facts_routed(fields_list))[0]
@@ -0,0 +1,225 @@
+# app/pipeline/records.py
+"""
+Typed fact records.
+
+Fetchers and the warehouse normalize upstream data once into these slotted
+records (no per-instance __dict__), and the blurb and prompt builders read
+attributes instead of repeating `.get()` and strip() calls. Each record is
+also a read-only Mapping with the same keys the old field dicts had, so code
+that still does `fields.get("sport")` or `dict(fields)` keeps working. Extra
+keys are left out while they are None, which keeps JSON output and
+fields_hash values the same as before.
+
+Upstream error placeholders stay plain dicts.
+"""
+from collections.abc import Mapping
+from typing import Any, Iterator, Optional, Tuple, Union
+
+STAT_NAMES = {
+    "PTS": "points",
+    "REB": "rebounds",
+    "AST": "assists",
+    "STL": "steals",
+    "BLK": "blocks",
+}
+
+
+def normalize_name(city: Optional[str], name: Optional[str]) -> str:
+    city = (city or "").strip()
+    name = (name or "").strip()
+    if city and name:
+        return f"{city} {name}"
+    return city or name or "Unknown Team"
+
+
+def clean_division(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    return name.replace("Division", "").strip()
+
+
+def pretty_year(y: Optional[str]) -> Optional[str]:
+    # MLB/NHL return strings like "1969"
+    if not y:
+        return None
+    try:
+        int(y)
+        return y
+    except ValueError:
+        return None
+
+
+def _text(value: Any) -> Optional[str]:
+    """Stripped string, or None for missing/blank values."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _int(value: Any) -> Optional[int]:
+    return None if value is None or value == "" else int(value)
+
+
+class FactRecord(Mapping):
+    """Mapping view over a record's slots: `_core` keys always, `_extra` keys when set."""
+    __slots__ = ()
+    sport = ""
+    _core: Tuple[str, ...] = ()
+    _extra: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._core:
+            return getattr(self, key)
+        if key in self._extra:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._core
+        for key in self._extra:
+            if getattr(self, key) is not None:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def to_dict(self) -> dict:
+        return dict(self)
+
+
+class MlbTeamFact(FactRecord):
+    """An MLB team, optionally with its place in the league's founding order."""
+    __slots__ = (
+        "fact_type", "team_city", "team_name", "abbrev", "first_year",
+        "league", "division", "venue", "founding_order", "founding_rank", "team_count",
+    )
+    sport = "mlb"
+    _core = ("sport", "fact_type", "team_city", "team_name", "abbrev", "first_year", "league", "division", "venue")
+    _extra = ("founding_order", "founding_rank", "team_count")
+
+    def __init__(
+        self,
+        team_city: Optional[str] = None,
+        team_name: Optional[str] = None,
+        abbrev: Optional[str] = None,
+        first_year: Any = None,
+        league: Optional[str] = None,
+        division: Optional[str] = None,
+        venue: Optional[str] = None,
+        fact_type: str = "team_info",
+        founding_order: Optional[str] = None,
+        founding_rank: Any = None,
+        team_count: Any = None,
+    ):
+        self.fact_type = fact_type
+        self.team_city = _text(team_city)
+        self.team_name = _text(team_name)
+        self.abbrev = _text(abbrev)
+        self.first_year = pretty_year(_text(first_year))
+        self.league = _text(league)
+        self.division = _text(division)
+        self.venue = _text(venue)
+        self.founding_order = _text(founding_order)
+        self.founding_rank = _int(founding_rank)
+        self.team_count = _int(team_count)
+
+    @classmethod
+    def from_api(cls, team: dict) -> "MlbTeamFact":
+        """From one entry of the StatsAPI /teams response."""
+        return cls(
+            team_city=team.get("locationName"),
+            team_name=team.get("teamName"),
+            abbrev=team.get("abbreviation"),
+            first_year=team.get("firstYearOfPlay"),
+            league=(team.get("league") or {}).get("name"),
+            division=(team.get("division") or {}).get("name"),
+            venue=(team.get("venue") or {}).get("name"),
+        )
+
+    @classmethod
+    def from_fields(cls, fields: Mapping) -> "MlbTeamFact":
+        """From a field dict, e.g. one decoded from the fact archive."""
+        return cls(**{key: fields.get(key) for key in cls.__slots__ if fields.get(key) is not None})
+
+    @property
+    def team(self) -> str:
+        return normalize_name(self.team_city, self.team_name)
+
+    @property
+    def division_short(self) -> Optional[str]:
+        return clean_division(self.division)
+
+
+class NbaLeaderFact(FactRecord):
+    """A player on an NBA all-time leaders list, with the detail its fact type needs."""
+    __slots__ = (
+        "fact_type", "category", "player_name", "rank", "value", "active",
+        "next_player", "gap", "milestone", "to_go", "target_player", "target_rank", "target_value",
+    )
+    sport = "nba"
+    _core = ("sport", "fact_type", "category", "player_name", "rank", "value", "active")
+    _extra = ("next_player", "gap", "milestone", "to_go", "target_player", "target_rank", "target_value")
+
+    def __init__(
+        self,
+        category: str,
+        player_name: Optional[str],
+        rank: Any,
+        value: Any,
+        active: bool = False,
+        fact_type: str = "career_leader",
+        next_player: Optional[str] = None,
+        gap: Any = None,
+        milestone: Any = None,
+        to_go: Any = None,
+        target_player: Optional[str] = None,
+        target_rank: Any = None,
+        target_value: Any = None,
+    ):
+        self.fact_type = fact_type
+        self.category = category
+        self.player_name = _text(player_name)
+        self.rank = _int(rank) or 0
+        self.value = _int(value)
+        self.active = bool(active)
+        self.next_player = _text(next_player)
+        self.gap = _int(gap)
+        self.milestone = _int(milestone)
+        self.to_go = _int(to_go)
+        self.target_player = _text(target_player)
+        self.target_rank = _int(target_rank)
+        self.target_value = _int(target_value)
+
+    @classmethod
+    def from_fields(cls, fields: Mapping) -> "NbaLeaderFact":
+        return cls(**{
+            key: fields.get(key) for key in cls.__slots__
+            if fields.get(key) is not None or key in ("category", "player_name", "rank", "value")
+        })
+
+    @property
+    def stat_name(self) -> str:
+        return STAT_NAMES.get(self.category, self.category or "stats")
+
+
+Record = Union[MlbTeamFact, NbaLeaderFact]
+
+
+def as_record(fields: Mapping) -> Optional[Record]:
+    """The typed record for `fields` (a record or an old-style dict), or None for errors/unknown sports."""
+    if isinstance(fields, (MlbTeamFact, NbaLeaderFact)):
+        return fields
+    if not fields or fields.get("fact_type") == "error":
+        return None
+    sport = (fields.get("sport") or "").lower()
+    if sport == "mlb":
+        return MlbTeamFact.from_fields(fields)
+    if sport == "nba":
+        return NbaLeaderFact.from_fields(fields)
+    return None
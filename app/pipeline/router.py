@@ -0,0 +1,171 @@
+# app/pipeline/router.py
+"""
+Latency-aware routing across several OpenRouter models.
+
+Each model keeps a rolling window of latencies and outcomes. Requests go to the
+fastest healthy model; models with no samples yet are tried first so every
+candidate gets measured. With hedging enabled, a second model is started if the
+first has not answered after `hedge_after` seconds, and whichever answers first
+wins while the other is cancelled. A model that fails outright also hands the
+request to the runner-up.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+# Below this many samples a model's error rate is not trusted yet
+MIN_SAMPLES = 5
+
+
+class RouteResult(NamedTuple):
+    text: Optional[str]
+    model: str
+    reason: str
+    latency_ms: int
+    hedged: bool = False
+
+
+class ModelStats:
+    """Rolling latency/outcome window for one model."""
+    def __init__(self, window: int = 50):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(pct * len(ordered)))]
+
+    @property
+    def samples(self) -> int:
+        return len(self.outcomes)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self) -> Dict:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "samples": self.samples,
+            "p50_ms": int(p50 * 1000) if p50 is not None else None,
+            "p95_ms": int(p95 * 1000) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 3),
+        }
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        models: List[str],
+        window: int = 50,
+        max_error_rate: float = 0.5,
+        hedge_after: Optional[float] = None,
+    ):
+        self.models = models
+        self.max_error_rate = max_error_rate
+        self.hedge_after = hedge_after
+        self._stats: Dict[str, ModelStats] = {m: ModelStats(window) for m in models}
+
+    def _healthy(self, model: str) -> bool:
+        stats = self._stats[model]
+        return stats.samples < MIN_SAMPLES or stats.error_rate <= self.max_error_rate
+
+    def rank(self) -> List[Tuple[str, str]]:
+        """Models in the order they should be tried, each with the reason for its place."""
+        unexplored = [m for m in self.models if not self._stats[m].latencies and self._stats[m].samples < MIN_SAMPLES]
+        healthy = [m for m in self.models if m not in unexplored and self._healthy(m)]
+        unhealthy = [m for m in self.models if m not in unexplored and not self._healthy(m)]
+
+        healthy.sort(key=lambda m: self._stats[m].percentile(0.5) or float("inf"))
+        unhealthy.sort(key=lambda m: self._stats[m].error_rate)
+
+        ranked = [(m, "exploring: no latency samples yet") for m in unexplored]
+        for m in healthy:
+            snap = self._stats[m].snapshot()
+            ranked.append((m, f"fastest healthy: p50={snap['p50_ms']}ms p95={snap['p95_ms']}ms"))
+        for m in unhealthy:
+            ranked.append((m, f"all faster models unhealthy: error_rate={self._stats[m].error_rate:.2f}"))
+        return ranked
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {m: self._stats[m].snapshot() for m in self.models}
+
+    async def _timed(self, model: str, call: Callable[[str], Awaitable[str]]) -> Tuple[str, Optional[str]]:
+        started = time.perf_counter()
+        try:
+            text = await call(model)
+        except asyncio.CancelledError:
+            # Lost a hedge race (or the caller gave up): no answer in time counts as
+            # a failed outcome, so the model is measured without adding a latency
+            # sample that could make it look faster than it is
+            self._stats[model].record(time.perf_counter() - started, False)
+            raise
+        except Exception as e:
+            logger.warning("openrouter call failed", extra={"model": model, "error": str(e)})
+            text = None
+        self._stats[model].record(time.perf_counter() - started, bool(text))
+        return model, text
+
+    async def run(self, call: Callable[[str], Awaitable[str]]) -> RouteResult:
+        """
+        Run `call(model)` on the best model. The runner-up is started if the first
+        model is slower than `hedge_after` (when set) or fails outright.
+        `call` returns the completion text or raises; failures come back as text=None.
+        """
+        started = time.perf_counter()
+        ranked = self.rank()
+        primary, reason = ranked[0]
+        tasks = {asyncio.ensure_future(self._timed(primary, call)): reason}
+        pending = set(tasks)
+        backup_started = len(ranked) < 2
+        hedged = False
+        model, text, why = primary, None, reason
+
+        def start_backup(why_backup: str):
+            task = asyncio.ensure_future(self._timed(ranked[1][0], call))
+            tasks[task] = why_backup
+            pending.add(task)
+
+        try:
+            while pending:
+                timeout = self.hedge_after if not backup_started else None
+                done, still_pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                pending.intersection_update(still_pending)
+                if not done:
+                    start_backup(f"hedge: {primary} slower than {int(self.hedge_after * 1000)}ms")
+                    backup_started = hedged = True
+                    continue
+                for task in done:
+                    model, text = task.result()
+                    why = tasks[task]
+                    if text:
+                        break
+                if text:
+                    break
+                if not backup_started:
+                    start_backup(f"failover: {primary} failed")
+                    backup_started = True
+        finally:
+            # Cancel the loser (or everything, if we were cancelled ourselves)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        latency_ms = int((time.perf_counter() - started) * 1000)
+        return RouteResult(text, model, why, latency_ms, hedged)
@@ -0,0 +1,321 @@
+# app/pipeline/warehouse.py
+"""
+Local columnar stats store.
+
+Upstream data is ingested periodically into one set of NumPy column arrays per
+sport/category and persisted as .npz files. The miner scores every row of every
+category at once (rank gaps, milestones, active players chasing the player
+above them) and keeps the best candidates as ready-made `fields` dicts, so
+picking a fact on the request path is a list lookup instead of an API call.
+"""
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.log import get_logger
+from app.pipeline.fetchers import HEADERS, NBA_STAT_MAPPING, fetch_nba_leader_sets
+from app.pipeline.records import MlbTeamFact, NbaLeaderFact, Record
+
+logger = get_logger(__name__)
+
+WAREHOUSE_DIR = os.getenv("WAREHOUSE_DIR", "./data/warehouse")
+WAREHOUSE_REFRESH_HOURS = float(os.getenv("WAREHOUSE_REFRESH_HOURS", "24"))
+NBA_TOPX = int(os.getenv("WAREHOUSE_NBA_TOPX", "250"))
+MINE_TOP = int(os.getenv("WAREHOUSE_MINE_TOP", "200"))
+
+# Round numbers worth calling out per category
+NBA_MILESTONE_STEPS = {"PTS": 5000, "AST": 1000, "REB": 1000, "STL": 250, "BLK": 250}
+
+# Only mention a milestone/chase when the player is this close (fraction of the gap unit)
+MILESTONE_WINDOW = 0.15
+CHASE_WINDOW = 0.05
+
+
+# ------------------------------------------------------------
+# INGEST
+# ------------------------------------------------------------
+def _column(result_set: Dict[str, Any], name: str) -> List[Any]:
+    idx = result_set["headers"].index(name)
+    return [row[idx] for row in result_set["rowSet"]]
+
+
+def _ingest_nba() -> Dict[str, Dict[str, np.ndarray]]:
+    result_sets = fetch_nba_leader_sets(NBA_TOPX)
+
+    tables = {}
+    for stat_type, index in NBA_STAT_MAPPING.items():
+        if index >= len(result_sets) or not result_sets[index]["rowSet"]:
+            continue
+        rs = result_sets[index]
+        ranks = np.asarray(_column(rs, f"{stat_type}_RANK"), dtype=np.int32)
+        order = np.argsort(ranks, kind="stable")
+        tables[stat_type] = {
+            "player_name": np.asarray(_column(rs, "PLAYER_NAME"), dtype=str)[order],
+            "value": np.asarray(_column(rs, stat_type), dtype=np.int64)[order],
+            "rank": ranks[order],
+            "active": (np.asarray(_column(rs, "IS_ACTIVE_FLAG"), dtype=str) == "Y")[order],
+        }
+    return tables
+
+
+def _ingest_mlb() -> Dict[str, Dict[str, np.ndarray]]:
+    import httpx
+    resp = httpx.get("https://statsapi.mlb.com/api/v1/teams?sportId=1", headers=HEADERS, timeout=10.0)
+    resp.raise_for_status()
+    teams = resp.json().get("teams", []) or []
+
+    def col(get) -> np.ndarray:
+        return np.asarray([get(t) or "" for t in teams], dtype=str)
+
+    first_year = [t.get("firstYearOfPlay") or "" for t in teams]
+    return {
+        "teams": {
+            "team_city": col(lambda t: t.get("locationName")),
+            "team_name": col(lambda t: t.get("teamName")),
+            "abbrev": col(lambda t: t.get("abbreviation")),
+            "league": col(lambda t: (t.get("league") or {}).get("name")),
+            "division": col(lambda t: (t.get("division") or {}).get("name")),
+            "venue": col(lambda t: (t.get("venue") or {}).get("name")),
+            "first_year": np.asarray([int(y) if y.isdigit() else 0 for y in first_year], dtype=np.int32),
+        }
+    }
+
+
+# ------------------------------------------------------------
+# MINE
+# ------------------------------------------------------------
+def _mine_nba_category(stat_type: str, table: Dict[str, np.ndarray]) -> List[tuple]:
+    names = table["player_name"]
+    values = table["value"]
+    ranks = table["rank"]
+    active = table["active"]
+    n = len(values)
+    if n < 2:
+        return []
+
+    candidates = []
+
+    def row(i: int, fact_type: str, **extra) -> NbaLeaderFact:
+        return NbaLeaderFact(
+            category=stat_type,
+            player_name=str(names[i]),
+            rank=int(ranks[i]),
+            value=int(values[i]),
+            active=bool(active[i]),
+            fact_type=fact_type,
+            **extra,
+        )
+
+    # Plain career-leader facts for the top 10, favouring the very top
+    top = min(n, 10)
+    leader_scores = 0.5 / np.sqrt(ranks[:top].astype(float))
+    for i in range(top):
+        candidates.append((float(leader_scores[i]), row(i, "career_leader")))
+
+    # Rank gaps: how far each player sits clear of the next one down
+    gaps = values[:-1] - values[1:]
+    rel_gaps = gaps / np.maximum(values[1:], 1)
+    gap_scores = np.clip(rel_gaps * 5.0, 0.0, 1.0) / np.sqrt(ranks[:-1].astype(float))
+    for i in np.flatnonzero(gap_scores > 0.05):
+        candidates.append((float(gap_scores[i]), row(
+            i, "rank_gap",
+            next_player=str(names[i + 1]),
+            gap=int(gaps[i]),
+        )))
+
+    # Milestones: active players closing in on the next round number
+    step = NBA_MILESTONE_STEPS.get(stat_type, 1000)
+    next_milestone = (values // step + 1) * step
+    to_go = next_milestone - values
+    near = active & (to_go <= step * MILESTONE_WINDOW)
+    milestone_scores = np.where(near, 1.0 - to_go / (step * MILESTONE_WINDOW), 0.0) + 0.2
+    for i in np.flatnonzero(near):
+        candidates.append((float(milestone_scores[i]), row(
+            i, "milestone",
+            milestone=int(next_milestone[i]),
+            to_go=int(to_go[i]),
+        )))
+
+    # Chases: active players within reach of the player ranked above, or the record
+    ahead = np.concatenate(([values[0]], values[:-1]))
+    behind = ahead - values
+    chasing = active & (ranks > 1) & (behind > 0) & (behind <= ahead * CHASE_WINDOW)
+    closeness = 1.0 - behind / np.maximum(ahead * CHASE_WINDOW, 1)
+    chase_scores = np.where(chasing, closeness / np.sqrt(np.maximum(ranks - 1, 1)), 0.0)
+    chase_scores = chase_scores + np.where(ranks == 2, 0.5, 0.0)
+    for i in np.flatnonzero(chasing):
+        candidates.append((float(chase_scores[i]), row(
+            i, "chase",
+            target_player=str(names[i - 1]),
+            target_rank=int(ranks[i - 1]),
+            target_value=int(values[i - 1]),
+            to_go=int(behind[i]),
+        )))
+
+    return candidates
+
+
+def _mine_mlb(table: Dict[str, np.ndarray]) -> List[tuple]:
+    first_year = table["first_year"]
+    n = len(first_year)
+    if n == 0:
+        return []
+
+    def row(i: int, fact_type: str, **extra) -> MlbTeamFact:
+        year = int(first_year[i])
+        return MlbTeamFact(
+            team_city=str(table["team_city"][i]),
+            team_name=str(table["team_name"][i]),
+            abbrev=str(table["abbrev"][i]),
+            first_year=str(year) if year else None,
+            league=str(table["league"][i]),
+            division=str(table["division"][i]),
+            venue=str(table["venue"][i]),
+            fact_type=fact_type,
+            **extra,
+        )
+
+    candidates = [(0.3, row(i, "team_info")) for i in range(n)]
+
+    # Founding order: the oldest and newest franchises make the best trivia
+    known = np.flatnonzero(first_year > 0)
+    order = known[np.argsort(first_year[known], kind="stable")]
+    total = len(order)
+    position = np.arange(1, total + 1)
+    extremity = np.abs(position - (total + 1) / 2.0) / max(total / 2.0, 1.0)
+    for pos, i, score in zip(position, order, extremity):
+        if score < 0.7:
+            continue
+        oldest = pos <= total / 2
+        candidates.append((float(score), row(
+            i, "founding_rank",
+            founding_order="oldest" if oldest else "newest",
+            founding_rank=int(pos if oldest else total - pos + 1),
+            team_count=int(total),
+        )))
+
+    return candidates
+
+
+def _top(candidates: List[tuple], k: int) -> List[Record]:
+    if not candidates:
+        return []
+    scores = np.fromiter((score for score, _ in candidates), dtype=float, count=len(candidates))
+    best = np.argsort(-scores, kind="stable")[:k]
+    return [candidates[i][1] for i in best]
+
+
+def mine_tables(tables: Dict[str, Dict[str, Dict[str, np.ndarray]]]) -> Dict[str, List[Record]]:
+    """Best candidates per sport. Pure and picklable, so it can run in a process pool."""
+    candidates = {}
+    nba = []
+    for stat_type, table in tables.get("nba", {}).items():
+        nba.extend(_mine_nba_category(stat_type, table))
+    candidates["nba"] = _top(nba, MINE_TOP)
+    if "teams" in tables.get("mlb", {}):
+        candidates["mlb"] = _top(_mine_mlb(tables["mlb"]["teams"]), MINE_TOP)
+    return {sport: c for sport, c in candidates.items() if c}
+
+
+# ------------------------------------------------------------
+# STORE
+# ------------------------------------------------------------
+class StatsWarehouse:
+    """Per-sport column arrays plus the mined candidate lists built from them."""
+
+    def __init__(self, directory: str = WAREHOUSE_DIR):
+        self.directory = directory
+        self.loaded_at: Optional[float] = None
+        self._tables: Dict[str, Dict[str, Dict[str, np.ndarray]]] = {}
+        self._candidates: Dict[str, List[Record]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, sport: str, name: str) -> str:
+        return os.path.join(self.directory, f"{sport}_{name}.npz")
+
+    def load(self) -> bool:
+        """Load persisted arrays from disk and mine them. Returns False if nothing is stored."""
+        if not os.path.isdir(self.directory):
+            return False
+        tables: Dict[str, Dict[str, Dict[str, np.ndarray]]] = {}
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.startswith(".") or not filename.endswith(".npz"):
+                continue
+            sport, name = filename[:-4].split("_", 1)
+            with np.load(os.path.join(self.directory, filename)) as data:
+                tables.setdefault(sport, {})[name] = {key: data[key] for key in data.files}
+        if not tables:
+            return False
+        self.install(tables, os.path.getmtime(self.directory))
+        return True
+
+    def ingest(self) -> None:
+        """Pull fresh upstream data, persist it and re-mine. Blocking; run off the event loop."""
+        self.install(self.fetch(), time.time())
+
+    def fetch(self) -> Dict[str, Dict[str, Dict[str, np.ndarray]]]:
+        """Pull fresh upstream data and persist it, keeping the old tables for a sport that fails."""
+        tables = {}
+        for sport, ingest in (("nba", _ingest_nba), ("mlb", _ingest_mlb)):
+            try:
+                tables[sport] = ingest()
+            except Exception as e:
+                logger.warning("warehouse ingest failed", extra={"sport": sport, "error": str(e)})
+                if sport in self._tables:
+                    tables[sport] = self._tables[sport]
+
+        os.makedirs(self.directory, exist_ok=True)
+        for sport, categories in tables.items():
+            for name, columns in categories.items():
+                tmp = os.path.join(self.directory, f".tmp-{sport}_{name}.npz")
+                np.savez(tmp, **columns)
+                os.replace(tmp, self._path(sport, name))
+        os.utime(self.directory)
+        return tables
+
+    def install(
+        self,
+        tables: Dict[str, Dict[str, Dict[str, np.ndarray]]],
+        loaded_at: float,
+        candidates: Optional[Dict[str, List[Record]]] = None,
+    ) -> None:
+        """Swap in new tables, mining them here unless `candidates` were mined elsewhere."""
+        if candidates is None:
+            candidates = mine_tables(tables)
+        with self._lock:
+            self._tables = tables
+            self._candidates = candidates
+            self.loaded_at = loaded_at
+
+    def reload_if_changed(self) -> bool:
+        """Pick up arrays another worker ingested since we last loaded. Returns True if reloaded."""
+        if not os.path.isdir(self.directory):
+            return False
+        if self.loaded_at is not None and os.path.getmtime(self.directory) <= self.loaded_at:
+            return False
+        return self.load()
+
+    def is_stale(self) -> bool:
+        if self.loaded_at is None:
+            return True
+        return (time.time() - self.loaded_at) > WAREHOUSE_REFRESH_HOURS * 3600
+
+    def candidates(self, sport: str) -> List[Record]:
+        return self._candidates.get(sport, [])
+
+    def sample(self, sport: str) -> Optional[Record]:
+        """One mined candidate for the sport, or None if the store is empty. Records are immutable, so no copy."""
+        pool = self._candidates.get(sport)
+        return random.choice(pool) if pool else None
+
+    def sample_many(self, sport: str, n: int) -> List[Record]:
+        pool = self._candidates.get(sport) or []
+        return random.sample(pool, min(n, len(pool)))
+
+
+# Singleton instance
+warehouse = StatsWarehouse()
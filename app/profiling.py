@@ -0,0 +1,107 @@
+# app/profiling.py
+"""
+Opt-in request profiling.
+
+A sampler thread snapshots the profiled thread's Python stack every
+PROFILE_INTERVAL_MS and counts identical stacks. The result is written as
+folded stacks ("frame;frame;frame count" per line), which flamegraph.pl,
+speedscope and inferno read directly. The event loop is shared, so a profile
+covers everything that ran on it during the request, not just this handler;
+time spent waiting on I/O shows up under the selector.
+
+When profiling is off, `profiled()` returns a nullcontext and no thread is started.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_EMAIL_RUNS = os.getenv("PROFILE_EMAIL_RUNS", "0") == "1"
+
+# Cap concurrent samplers so sampled traffic cannot pile up threads
+_slots = threading.BoundedSemaphore(int(os.getenv("PROFILE_MAX_CONCURRENT", "2")))
+
+
+def should_profile(requested: Optional[int], secret: Optional[str]) -> bool:
+    """Explicit ?profile=1 needs the admin secret; otherwise sample PROFILE_SAMPLE_RATE of traffic."""
+    if requested:
+        return secret == os.getenv("ADMIN_SECRET", "dev-secret-123")
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.path: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, name: str) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(PROFILE_DIR, f"{name}-{stamp}-{os.getpid()}-{id(self) & 0xffff:04x}.folded")
+        with open(self.path, "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        return self.path
+
+
+@contextmanager
+def _sampling(name: str):
+    if not _slots.acquire(blocking=False):
+        yield None
+        return
+    sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+    sampler.start()
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
+        _slots.release()
+        try:
+            path = sampler.write(name)
+            logger.info("profile written", extra={"path": path, "samples": sampler.samples})
+        except OSError as e:
+            logger.error("profile write failed", extra={"error": str(e)})
+
+
+def profiled(name: str, enabled: bool):
+    """Context manager yielding a StackSampler (or None); `sampler.path` is set on exit."""
+    return _sampling(name) if enabled else nullcontext()
@@ -0,0 +1,134 @@
+# app/scheduler.py
+"""
+In-process background jobs: local-morning email slots, the daily fact of the
+day and warehouse refresh.
+Replaces the external 09:00 UTC cron that posted to /api/email/send-daily.
+
+With several workers every process runs this scheduler, but only the lease
+leader (app.leader) does the work; the others just keep trying for the lease
+and reload the warehouse files the leader writes.
+
+APScheduler, NumPy and the warehouse snapshot are loaded by start_background()
+after startup, off the event loop, rather than when this module is imported.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.executors import run_in
+from app.leader import leader, exclusive, LEADER_RENEW_SECONDS, SEND_LEASE_SECONDS
+from app.log import get_logger, job_context
+from app.profiling import profiled, PROFILE_EMAIL_RUNS
+from app.services.email_service import email_service, SEND_SLOT_MINUTES
+from app.services.fact_of_the_day import fact_of_the_day
+
+logger = get_logger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+
+# AsyncIOScheduler, created by start_scheduler()
+scheduler = None
+
+
+async def renew_leadership():
+    await asyncio.to_thread(leader.acquire)
+
+
+async def send_due_emails():
+    if not leader.held or not email_service.is_configured():
+        return
+    with job_context("scheduled-send"), exclusive("email-send", SEND_LEASE_SECONDS) as acquired:
+        if not acquired:
+            logger.info("email run already in progress, skipping slot")
+            return
+        try:
+            with profiled("scheduled-send", PROFILE_EMAIL_RUNS):
+                result = await email_service.send_due_emails()
+            if result["total"]:
+                logger.info("scheduled send finished", extra=result)
+        except Exception as e:
+            logger.error("scheduled send failed", extra={"error": str(e)})
+
+
+async def refresh_warehouse():
+    """Re-ingest the local stats warehouse whenever it goes stale (leader only)."""
+    from app.pipeline.warehouse import warehouse, mine_tables
+    if not leader.held:
+        await run_in("warehouse", warehouse.reload_if_changed)
+        return
+    if not warehouse.is_stale():
+        return
+    with job_context("warehouse-refresh"):
+        try:
+            tables = await run_in("warehouse", warehouse.fetch)
+            candidates = await run_in("cpu", mine_tables, tables)
+            warehouse.install(tables, time.time(), candidates)
+        except Exception as e:
+            logger.error("warehouse refresh failed", extra={"error": str(e)})
+
+
+async def create_facts_of_the_day():
+    """Store today's fact for each sport (leader only); requests then just read it."""
+    if not leader.held:
+        return
+    with job_context("fact-of-the-day"):
+        try:
+            await fact_of_the_day.ensure_all()
+        except Exception as e:
+            logger.error("fact of the day job failed", extra={"error": str(e)})
+
+
+def load_background_modules():
+    """Import the scheduler and warehouse modules and load the warehouse snapshot. Blocking."""
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler  # noqa: F401
+    from app.pipeline.warehouse import warehouse
+    warehouse.load()
+
+
+async def start_background():
+    """Startup work that can wait until the server is accepting requests."""
+    try:
+        await asyncio.to_thread(load_background_modules)
+    except Exception as e:
+        logger.error("warehouse load failed", extra={"error": str(e)})
+    start_scheduler()
+
+
+def start_scheduler():
+    global scheduler
+    if not SCHEDULER_ENABLED:
+        return
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from app.pipeline.warehouse import WAREHOUSE_REFRESH_HOURS
+
+    scheduler = AsyncIOScheduler(timezone="UTC")
+    scheduler.add_job(
+        renew_leadership, "interval", seconds=LEADER_RENEW_SECONDS,
+        id="leader-lease", max_instances=1, coalesce=True,
+        next_run_time=datetime.now(timezone.utc),
+    )
+    scheduler.add_job(
+        send_due_emails, "cron", minute=f"*/{SEND_SLOT_MINUTES}",
+        id="scheduled-sends", max_instances=1, coalesce=True,
+    )
+    scheduler.add_job(
+        create_facts_of_the_day, "cron", hour=0, minute=1,
+        id="fact-of-the-day", max_instances=1, coalesce=True,
+        next_run_time=datetime.now(timezone.utc) + timedelta(seconds=5),
+    )
+    if WAREHOUSE_REFRESH_HOURS > 0:
+        scheduler.add_job(
+            refresh_warehouse, "interval", minutes=10,
+            id="warehouse-refresh", max_instances=1, coalesce=True,
+            # Give the first lease attempt a head start so a fresh deploy ingests right away
+            next_run_time=datetime.now(timezone.utc) + timedelta(seconds=5),
+        )
+    scheduler.start()
+
+
+def stop_scheduler():
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown(wait=False)
+    leader.release()
+
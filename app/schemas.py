@@ -1,4 +1,4 @@
-from typing import List, Literal
+from typing import List, Literal, Optional
 from pydantic import BaseModel, EmailStr, Field
 
 Sport = Literal["nba", "mlb", "nhl"]
@@ -6,6 +6,7 @@ Sport = Literal["nba", "mlb", "nhl"]
 class SubscribeIn(BaseModel):
     email: EmailStr
     sports: List[Sport] = Field(default_factory=list)
+    timezone: Optional[str] = None  # IANA name, e.g. "America/Toronto"
 
 class SubscribeOut(BaseModel):
     ok: bool
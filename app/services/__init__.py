@@ -1,4 +1,3 @@
 # app/services/__init__.py
-from .email_service import EmailService, email_service
-
-__all__ = ["EmailService", "email_service"]
+# Import services from their modules (app.services.email_service, ...); nothing is
+# re-exported here, so importing one service does not load the others.
@@ -1,56 +1,218 @@
 # app/services/email_service.py
 import os
-import resend
-from typing import List, Optional
-from datetime import datetime
+import asyncio
+import json
+import random
+import zlib
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import or_
 from sqlmodel import Session, select
 from app.db import engine
 from app.models import Subscriber
-from app.pipeline.fetchers import fetch_sport_sample
-from app.pipeline.llm import compose_fact
+from app.pipeline.fetchers import fetch_sport_sample, fetch_sport_batch
+from app.pipeline.llm import compose_fact_routed, compose_facts_routed, BATCH_SIZE, LLM_BUDGETS_MS
 from app.pipeline.agents import render_blurb
+from app.services.fact_archive import fact_archive
+from app.services.fact_of_the_day import fact_of_the_day, SPORTS
+from app.services.fact_pool import FACT_POOL_SIZE, fact_key, pack_seen, pick_unseen, unpack_seen
+from app.services.suppression import SuppressionIndex
+from app.services.transports import EmailSendError, EmailTransport, OutgoingEmail, make_transport
+from app.log import get_logger
+
+logger = get_logger(__name__)
 
 # Configuration
-RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
 FROM_EMAIL = os.getenv("FROM_EMAIL", "onboarding@resend.dev")
 FROM_NAME = os.getenv("FROM_NAME", "Sports Facts")
 
+# Scheduled delivery: subscribers get their email from SEND_LOCAL_HOUR local time,
+# spread over the hour in SEND_SLOT_MINUTES slots by a hash of their address
+SEND_LOCAL_HOUR = int(os.getenv("SEND_LOCAL_HOUR", "9"))
+SEND_SLOT_MINUTES = int(os.getenv("SEND_SLOT_MINUTES", "15"))
+SEND_SLOT_LIMIT = int(os.getenv("SEND_SLOT_LIMIT", "500"))
+# Messages handed to the transport at once during a subscriber run; 0 uses the
+# transport's own figure (SMTP_POOL_SIZE * SMTP_BATCH for smtp, 8 for resend)
+EMAIL_SEND_CONCURRENCY = int(os.getenv("EMAIL_SEND_CONCURRENCY", "0"))
+# Failed (not rejected) sends are retried in later slots, up to this many attempts a day
+SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", "3"))
+
+# Outcomes of EmailService.deliver
+SENT = "sent"
+REJECTED = "rejected"
+FAILED = "failed"
+
+
+# Sent when no fact could be generated or archived; never pooled
+GENERIC_FACT_TEXT = "Did you know? Sports bring people together from all around the world!"
+
+
+def is_real_fact(fact: dict) -> bool:
+    """False for the generic fallback and for facts rendered from an upstream error record."""
+    text = fact.get("text")
+    return bool(text) and text != GENERIC_FACT_TEXT and (fact.get("data") or {}).get("fact_type") != "error"
+
+
+def get_zone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
+
+def subscriber_zone(subscriber: Subscriber) -> ZoneInfo:
+    return get_zone(subscriber.timezone)
+
+
+def send_slot_offset(email: str) -> int:
+    """Minutes after SEND_LOCAL_HOUR at which this subscriber's slot opens."""
+    slots = max(1, 60 // SEND_SLOT_MINUTES)
+    return (zlib.crc32(email.lower().encode("utf-8")) % slots) * SEND_SLOT_MINUTES
+
+
+def minutes_into_send_window(local: datetime) -> int:
+    return (local.hour - SEND_LOCAL_HOUR) * 60 + local.minute
+
 class EmailService:
-    def __init__(self):
-        self.is_configured_flag = False
-        if RESEND_API_KEY and not RESEND_API_KEY.startswith("re_") == False:
-            resend.api_key = RESEND_API_KEY
-            self.is_configured_flag = True
+    def __init__(self, transport: Optional[EmailTransport] = None):
+        # Resend or SMTP, per EMAIL_TRANSPORT; built on first use
+        self._transport = transport
+        # Today's personalisation pools: (sport, UTC date) -> [(fact_key, fact)]
+        self._pools: Dict[Tuple[str, date], List[Tuple[int, dict]]] = {}
+
+    @property
+    def transport(self) -> EmailTransport:
+        if self._transport is None:
+            self._transport = make_transport()
+        return self._transport
+
+    async def close(self):
+        if self._transport is not None:
+            await self._transport.close()
     
     def is_configured(self) -> bool:
-        """Check if Resend is properly configured."""
-        return self.is_configured_flag
+        """Check if the email transport is properly configured."""
+        return self.transport.is_configured()
     
     async def generate_daily_fact(self, sport: str = "random") -> dict:
         """Generate a fact for the daily email."""
         try:
             # Fetch data
             fields = await fetch_sport_sample(sport)
+            if fields.get("fact_type") == "error":
+                raise RuntimeError(fields.get("error", "No data available"))
             
             # Try LLM first, fallback to template
-            llm_fact = compose_fact(fields)
+            route = await compose_fact_routed(fields, budget_ms=LLM_BUDGETS_MS["email"])
+            llm_fact = route.text
             fact_text = llm_fact if llm_fact else render_blurb(fields)
+
+            fact_archive.record(
+                fields,
+                fact_text,
+                model=route.model if llm_fact else "template",
+                llm=bool(llm_fact),
+                latency_ms=route.latency_ms,
+            )
             
             return {
                 "text": fact_text,
                 "sport": fields.get("sport", sport),
                 "llm_used": bool(llm_fact),
-                "data": fields
+                "data": dict(fields)
             }
         except Exception as e:
-            print(f"Error generating fact: {e}")
+            logger.warning("fact generation failed", extra={"sport": sport, "error": str(e)})
+            archived = fact_archive.fallback(sport)
+            if archived is not None:
+                return {
+                    "text": archived.text,
+                    "sport": archived.sport,
+                    "llm_used": archived.llm,
+                    "data": json.loads(archived.fields_json or "{}")
+                }
             return {
-                "text": "Did you know? Sports bring people together from all around the world!",
+                "text": GENERIC_FACT_TEXT,
                 "sport": sport,
                 "llm_used": False,
                 "data": {}
             }
     
+    async def daily_fact(self, sport: str = "random") -> dict:
+        """Today's stored fact of the day for the sport (a random sport's for "random")."""
+        if sport not in SPORTS:
+            sport = random.choice(SPORTS)
+        fotd = await fact_of_the_day.ensure(sport)
+        if fotd is None:
+            return await self.generate_daily_fact(sport)
+        return fact_of_the_day.as_email_fact(fotd)
+
+    async def generate_daily_facts(self, sport: str, n: int) -> List[dict]:
+        """
+        Generate up to n distinct facts for one sport with a single upstream fetch
+        and one LLM request per BATCH_SIZE facts.
+        """
+        try:
+            records = await fetch_sport_batch(None if sport == "random" else sport, n)
+        except Exception as e:
+            logger.warning("fact batch fetch failed", extra={"sport": sport, "error": str(e)})
+            return [await self.generate_daily_fact(sport)]
+
+        facts = []
+        rows = []
+        for i in range(0, len(records), BATCH_SIZE):
+            chunk = records[i:i + BATCH_SIZE]
+            llm_facts, route = await compose_facts_routed(chunk, budget_ms=LLM_BUDGETS_MS["email"])
+            for fields, llm_fact in zip(chunk, llm_facts):
+                fact_text = llm_fact if llm_fact else render_blurb(fields)
+                rows.append((fields, fact_text, route.model if llm_fact else "template", bool(llm_fact), route.latency_ms))
+                facts.append({
+                    "text": fact_text,
+                    "sport": fields.get("sport", sport),
+                    "llm_used": bool(llm_fact),
+                    "data": dict(fields)
+                })
+        fact_archive.record_many(rows)
+        return facts or [await self.generate_daily_fact(sport)]
+    
+    async def fact_pool(self, sport: str, day: date) -> List[Tuple[int, dict]]:
+        """
+        The day's pool of distinct facts for a sport: the fact of the day plus
+        FACT_POOL_SIZE - 1 generated in one batch. Built once per day and reused
+        by every send slot; "random" is the union of the sports' pools.
+        Fallback and error facts are left out, and a pool missing any of them
+        is not cached, so the next slot tries again.
+        """
+        if sport not in SPORTS:
+            pool = []
+            for each in SPORTS:
+                pool.extend(await self.fact_pool(each, day))
+            return pool
+
+        cached = self._pools.get((sport, day))
+        if cached is not None:
+            return cached
+
+        facts = [await self.daily_fact(sport)]
+        if FACT_POOL_SIZE > 1:
+            facts.extend(await self.generate_daily_facts(sport, FACT_POOL_SIZE - 1))
+        real = [fact for fact in facts if is_real_fact(fact)]
+        pool = []
+        keys = set()
+        for fact in real:
+            key = fact_key(fact)
+            if key not in keys:
+                keys.add(key)
+                pool.append((key, fact))
+
+        if not pool or len(real) < len(facts):
+            logger.warning("fact pool degraded, not caching", extra={"sport": sport, "facts": len(facts), "usable": len(real)})
+            return pool
+        self._pools = {k: v for k, v in self._pools.items() if k[1] == day}
+        self._pools[(sport, day)] = pool
+        return pool
+
     def create_email_html(self, fact: dict, subscriber_email: str) -> str:
         """Create HTML email content."""
         sport = fact.get("sport", "sports").upper()
@@ -175,33 +337,31 @@ class EmailService:
     
     async def send_email(self, to_email: str, fact: dict) -> bool:
         """Send a single email with the daily fact."""
+        return await self.deliver(to_email, fact) == SENT
+
+    async def deliver(self, to_email: str, fact: dict) -> str:
+        """Send the daily fact email; returns SENT, REJECTED (permanent) or FAILED (worth retrying)."""
         if not self.is_configured():
-            print(f"Resend not configured. Would send to {to_email}")
-            print(f"Fact: {fact.get('text', '')}")
-            return False
+            logger.info("email transport not configured, email not sent", extra={"to": to_email, "fact": fact.get("text", "")})
+            return FAILED
         
         try:
             html_content = self.create_email_html(fact, to_email)
-            
-            params = {
-                "from": FROM_EMAIL,
-                "to": to_email,
-                "subject": f"🏆 Your Daily Sports Fact - {fact.get('sport', 'Sports').upper()}",
-                "html": html_content
-            }
-            
-            response = resend.Emails.send(params)
-            
-            if response and 'id' in response:
-                print(f"✅ Email sent successfully to {to_email} (ID: {response['id']})")
-                return True
-            else:
-                print(f"❌ Failed to send email to {to_email}: {response}")
-                return False
-                
+            message = OutgoingEmail(
+                sender=FROM_EMAIL,
+                to=to_email,
+                subject=f"🏆 Your Daily Sports Fact - {fact.get('sport', 'Sports').upper()}",
+                html=html_content,
+            )
+            message_id = await self.transport.send(message)
+            logger.info("email sent", extra={"to": to_email, "message_id": message_id})
+            return SENT
+        except EmailSendError as e:
+            logger.warning("email rejected", extra={"to": to_email, "error": str(e), "permanent": e.permanent})
+            return REJECTED if e.permanent else FAILED
         except Exception as e:
-            print(f"❌ Error sending email to {to_email}: {e}")
-            return False
+            logger.error("email send failed", extra={"to": to_email, "error": str(e)})
+            return FAILED
     
     def create_welcome_html(self, subscriber_email: str, sports: list) -> str:
         """Create HTML for the welcome/confirmation email."""
@@ -311,73 +471,191 @@ class EmailService:
     async def send_welcome_email(self, to_email: str, sports: list) -> bool:
         """Send a confirmation/welcome email to a new subscriber."""
         if not self.is_configured():
-            print(f"Resend not configured. Would send welcome email to {to_email}")
+            logger.info("email transport not configured, welcome email not sent", extra={"to": to_email})
             return False
 
         try:
             html_content = self.create_welcome_html(to_email, sports)
-            params = {
-                "from": FROM_EMAIL,
-                "to": to_email,
-                "subject": "Welcome to Sports Facts — you're on the list",
-                "html": html_content,
-            }
-            response = resend.Emails.send(params)
-            if response and "id" in response:
-                print(f"✅ Welcome email sent to {to_email} (ID: {response['id']})")
-                return True
-            else:
-                print(f"❌ Failed to send welcome email to {to_email}: {response}")
-                return False
+            message = OutgoingEmail(
+                sender=FROM_EMAIL,
+                to=to_email,
+                subject="Welcome to Sports Facts — you're on the list",
+                html=html_content,
+            )
+            message_id = await self.transport.send(message)
+            logger.info("welcome email sent", extra={"to": to_email, "message_id": message_id})
+            return True
+        except EmailSendError as e:
+            logger.warning("welcome email rejected", extra={"to": to_email, "error": str(e)})
+            return False
         except Exception as e:
-            print(f"❌ Error sending welcome email to {to_email}: {e}")
+            logger.error("welcome email send failed", extra={"to": to_email, "error": str(e)})
             return False
 
+    @staticmethod
+    def subscriber_sport(subscriber: Subscriber, sport: str) -> str:
+        """Which sport a subscriber gets when the run is for `sport`."""
+        if sport != "random":
+            return sport
+        # For random, pick based on subscriber preferences
+        if subscriber.nba and not subscriber.mlb:
+            return "nba"
+        elif subscriber.mlb and not subscriber.nba:
+            return "mlb"
+        # Has both or none, use random
+        return "random"
+
+    async def send_to_subscribers(
+        self,
+        session: Session,
+        subscribers: List[Subscriber],
+        sport: str,
+        fact: dict,
+        now: Optional[datetime] = None,
+        suppressed: Optional[SuppressionIndex] = None,
+    ) -> Tuple[int, int, int]:
+        """
+        Send each subscriber a fact for their sport and stamp last_sent_on with
+        their local date once it is sent, permanently rejected, or has failed
+        SEND_MAX_ATTEMPTS times today; other failures are retried next slot. With FACT_POOL_SIZE > 0 every subscriber gets a fact
+        from the day's pool they have not seen before (and waits for a later
+        slot while their sport has no usable pool); otherwise `fact` (or the
+        fact of the day for their sport). Addresses in `suppressed` are skipped
+        without a provider call.
+        Returns (sent, failed, skipped).
+        """
+        now = now or datetime.now(timezone.utc)
+        sent_count = 0
+        failed_count = 0
+
+        if suppressed is not None:
+            total = len(subscribers)
+            subscribers = [s for s in subscribers if s.email not in suppressed]
+            skipped_count = total - len(subscribers)
+        else:
+            skipped_count = 0
+
+        # Work out which sport each subscriber gets
+        subscriber_sports = [self.subscriber_sport(s, sport) for s in subscribers]
+
+        # Per-sport facts: the day's pools when personalising, else the
+        # shared fact or that sport's fact of the day
+        day = now.astimezone(timezone.utc).date()
+        pools = {}
+        extra_facts = {}
+        for other_sport in set(subscriber_sports):
+            if FACT_POOL_SIZE > 0:
+                pools[other_sport] = await self.fact_pool(other_sport, day)
+            elif other_sport != sport:
+                extra_facts[other_sport] = await self.daily_fact(other_sport)
+        
+        assignments = []
+        for subscriber, subscriber_sport in zip(subscribers, subscriber_sports):
+            pool = pools.get(subscriber_sport)
+            if FACT_POOL_SIZE > 0 and not pool:
+                # No usable fact for this sport yet; they stay due for the next slot
+                continue
+            if pool:
+                seen = unpack_seen(subscriber.seen_facts)
+                key, subscriber_fact = pick_unseen(pool, set(seen), subscriber.email, day)
+                assignments.append((subscriber, subscriber_fact, seen + [key]))
+            else:
+                assignments.append((subscriber, extra_facts.get(subscriber_sport, fact), None))
+
+        # Send concurrently so pooled transports can keep their connections busy
+        limit = asyncio.Semaphore(max(1, EMAIL_SEND_CONCURRENCY or self.transport.concurrency))
+
+        async def send_one(email: str, subscriber_fact: dict) -> str:
+            async with limit:
+                return await self.deliver(email, subscriber_fact)
+
+        results = await asyncio.gather(*(send_one(s.email, f) for s, f, _ in assignments))
+
+        for (subscriber, _, seen), outcome in zip(assignments, results):
+            local_day = now.astimezone(subscriber_zone(subscriber)).date()
+            if outcome == SENT:
+                sent_count += 1
+                if seen is not None:
+                    subscriber.seen_facts = pack_seen(seen)
+                subscriber.last_sent_on = local_day
+            else:
+                failed_count += 1
+                if subscriber.failed_on != local_day:
+                    subscriber.failed_on = local_day
+                    subscriber.failed_attempts = 0
+                subscriber.failed_attempts = (subscriber.failed_attempts or 0) + 1
+                if outcome == REJECTED or subscriber.failed_attempts >= SEND_MAX_ATTEMPTS:
+                    # Done for today; transient failures below the cap are picked up next slot
+                    subscriber.last_sent_on = local_day
+            session.add(subscriber)
+        session.commit()
+        return sent_count, failed_count, skipped_count
+
     async def send_daily_emails(self, sport: str = "random") -> dict:
         """Send daily emails to all subscribers."""
-        # Generate fact
-        fact = await self.generate_daily_fact(sport)
+        # Today's stored fact, shared with the website
+        fact = await self.daily_fact(sport)
         
         with Session(engine) as session:
             # Get all subscribers
             subscribers = session.exec(select(Subscriber)).all()
-            
-            sent_count = 0
-            failed_count = 0
-            
-            for subscriber in subscribers:
-                # Check if subscriber wants this sport
-                if sport == "random":
-                    # For random, pick based on subscriber preferences
-                    if subscriber.nba and not subscriber.mlb:
-                        subscriber_sport = "nba"
-                    elif subscriber.mlb and not subscriber.nba:
-                        subscriber_sport = "mlb"
-                    else:
-                        # Has both or none, use random
-                        subscriber_sport = "random"
-                else:
-                    subscriber_sport = sport
-                
-                # Generate fact for this subscriber if needed
-                if subscriber_sport != sport:
-                    subscriber_fact = await self.generate_daily_fact(subscriber_sport)
-                else:
-                    subscriber_fact = fact
-                
-                # Send email
-                success = await self.send_email(subscriber.email, subscriber_fact)
-                if success:
-                    sent_count += 1
-                else:
-                    failed_count += 1
+            sent_count, failed_count, skipped_count = await self.send_to_subscribers(
+                session, subscribers, sport, fact, suppressed=SuppressionIndex.load()
+            )
             
             return {
                 "total": len(subscribers),
                 "sent": sent_count,
                 "failed": failed_count,
+                "suppressed": skipped_count,
                 "fact": fact
             }
 
+    async def send_due_emails(self, now: Optional[datetime] = None) -> dict:
+        """
+        Send to subscribers whose local morning slot has arrived and who have not
+        had today's email yet. Runs every SEND_SLOT_MINUTES from the scheduler;
+        at most SEND_SLOT_LIMIT recipients per run, the rest carry to the next slot.
+        Suppressed subscribers are stamped as handled for their local day, so
+        they are not selected again by every later slot.
+        """
+        now = now or datetime.now(timezone.utc)
+        suppressed = SuppressionIndex.load()
+        due = []
+        skipped_count = 0
+        with Session(engine) as session:
+            zones = session.exec(select(Subscriber.timezone).distinct()).all()
+            for zone_name in zones:
+                local = now.astimezone(get_zone(zone_name))
+                if local.hour < SEND_LOCAL_HOUR:
+                    continue
+                query = select(Subscriber).where(
+                    Subscriber.timezone == zone_name if zone_name is not None else Subscriber.timezone.is_(None),
+                    or_(Subscriber.last_sent_on.is_(None), Subscriber.last_sent_on < local.date()),
+                )
+                for subscriber in session.exec(query).all():
+                    if minutes_into_send_window(local) < send_slot_offset(subscriber.email):
+                        continue
+                    if subscriber.email in suppressed:
+                        subscriber.last_sent_on = local.date()
+                        session.add(subscriber)
+                        skipped_count += 1
+                        continue
+                    due.append(subscriber)
+                    if len(due) >= SEND_SLOT_LIMIT:
+                        break
+                if len(due) >= SEND_SLOT_LIMIT:
+                    break
+            if skipped_count:
+                session.commit()
+
+            if not due:
+                return {"total": 0, "sent": 0, "failed": 0, "suppressed": skipped_count}
+
+            fact = await self.daily_fact("random")
+            sent_count, failed_count, _ = await self.send_to_subscribers(session, due, "random", fact, now)
+            return {"total": len(due), "sent": sent_count, "failed": failed_count, "suppressed": skipped_count}
+
+
 # Singleton instance
 email_service = EmailService()
@@ -0,0 +1,107 @@
+# app/services/fact_archive.py
+import hashlib
+import json
+import random
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.models import Fact
+
+# How many recent facts the fallback picks from
+FALLBACK_WINDOW = 50
+
+
+def fields_hash(fields: Mapping) -> str:
+    """Stable short hash of the source fields a fact was written from."""
+    raw = json.dumps(dict(fields), sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(fact: Fact) -> str:
+    return f"{fact.created_at.isoformat()}~{fact.id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    created_at, fact_id = cursor.rsplit("~", 1)
+    return datetime.fromisoformat(created_at), int(fact_id)
+
+
+class FactArchive:
+    def record(
+        self,
+        fields: Dict,
+        text: str,
+        model: str = "",
+        llm: bool = False,
+        latency_ms: int = 0,
+    ) -> Optional[Fact]:
+        """Persist one generated fact."""
+        facts = self.record_many([(fields, text, model, llm, latency_ms)])
+        return facts[0] if facts else None
+
+    def record_many(self, rows: List[Tuple[Dict, str, str, bool, int]]) -> List[Fact]:
+        """Persist several facts in one transaction."""
+        facts = [
+            Fact(
+                sport=fields.get("sport", "unknown"),
+                text=text,
+                fields_hash=fields_hash(fields),
+                fields_json=json.dumps(dict(fields), default=str),
+                model=model,
+                llm=llm,
+                latency_ms=latency_ms,
+            )
+            for fields, text, model, llm, latency_ms in rows
+            # Upstream error placeholders are not facts worth replaying
+            if fields.get("fact_type") != "error"
+        ]
+        with Session(engine, expire_on_commit=False) as session:
+            session.add_all(facts)
+            session.commit()
+        return facts
+
+    def history(
+        self,
+        sport: Optional[str] = None,
+        before: Optional[str] = None,
+        limit: int = 20,
+    ) -> Tuple[List[Fact], Optional[str]]:
+        """
+        Newest-first page of facts. `before` is the cursor returned by the
+        previous page; the next cursor is None once the archive is exhausted.
+        """
+        query = select(Fact)
+        if sport:
+            query = query.where(Fact.sport == sport)
+        if before:
+            created_at, fact_id = decode_cursor(before)
+            query = query.where(or_(
+                Fact.created_at < created_at,
+                and_(Fact.created_at == created_at, Fact.id < fact_id),
+            ))
+        query = query.order_by(Fact.created_at.desc(), Fact.id.desc()).limit(limit + 1)
+
+        with Session(engine) as session:
+            facts = session.exec(query).all()
+
+        next_cursor = encode_cursor(facts[limit - 1]) if len(facts) > limit else None
+        return list(facts[:limit]), next_cursor
+
+    def fallback(self, sport: Optional[str] = None) -> Optional[Fact]:
+        """Pick one of the most recent archived facts, or None if the archive is empty."""
+        query = select(Fact)
+        if sport in ("mlb", "nba"):
+            query = query.where(Fact.sport == sport)
+        query = query.order_by(Fact.created_at.desc()).limit(FALLBACK_WINDOW)
+
+        with Session(engine) as session:
+            facts = session.exec(query).all()
+        return random.choice(facts) if facts else None
+
+
+# Singleton instance
+fact_archive = FactArchive()
@@ -0,0 +1,129 @@
+# app/services/fact_of_the_day.py
+import asyncio
+import json
+import os
+import time
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.log import get_logger
+from app.models import Fact, FactOfTheDay
+from app.pipeline.agents import render_blurb
+from app.pipeline.fetchers import fetch_sport_sample
+from app.pipeline.llm import compose_fact_routed, LLM_BUDGETS_MS
+from app.services.fact_archive import fact_archive
+
+logger = get_logger(__name__)
+
+SPORTS = ("mlb", "nba")
+
+# After a failed creation, `ensure` answers None for this long instead of retrying,
+# so requests arriving while upstreams are down do not each trigger a new attempt
+FOTD_RETRY_SECONDS = float(os.getenv("FOTD_RETRY_SECONDS", "60"))
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+class FactOfTheDayService:
+    """
+    One stored fact per sport and UTC date. A scheduled job creates the day's
+    facts just after midnight; `ensure` also creates them on first request if
+    the job has not run. Creation races between workers are settled by the
+    (sport, day) unique constraint.
+    """
+
+    def __init__(self):
+        # Creations in progress in this worker, so concurrent first requests share one
+        self._pending: Dict[Tuple[str, date], asyncio.Future] = {}
+        # (sport, day) -> monotonic time of the last failed creation in this worker
+        self._failed: Dict[Tuple[str, date], float] = {}
+
+    def get(self, sport: str, day: Optional[date] = None) -> Optional[FactOfTheDay]:
+        day = day or utc_today()
+        with Session(engine) as session:
+            return session.exec(
+                select(FactOfTheDay).where(FactOfTheDay.sport == sport, FactOfTheDay.day == day)
+            ).first()
+
+    async def ensure(self, sport: str, day: Optional[date] = None) -> Optional[FactOfTheDay]:
+        """Stored fact of the day for `sport`, creating it if needed. None if nothing could be produced."""
+        day = day or utc_today()
+        existing = self.get(sport, day)
+        if existing is not None:
+            return existing
+
+        key = (sport, day)
+        failed_at = self._failed.get(key)
+        if failed_at is not None and time.monotonic() - failed_at < FOTD_RETRY_SECONDS:
+            return None
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._create(sport, day))
+            self._pending[key] = task
+            task.add_done_callback(lambda done: self._settle(key, done))
+        return await asyncio.shield(task)
+
+    def _settle(self, key: Tuple[str, date], task: asyncio.Future):
+        self._pending.pop(key, None)
+        if task.cancelled() or task.exception() is not None or task.result() is None:
+            self._failed[key] = time.monotonic()
+        else:
+            self._failed.pop(key, None)
+
+    async def ensure_all(self, day: Optional[date] = None) -> List[FactOfTheDay]:
+        facts = await asyncio.gather(*(self.ensure(sport, day) for sport in SPORTS))
+        return [fact for fact in facts if fact is not None]
+
+    async def _create(self, sport: str, day: date) -> Optional[FactOfTheDay]:
+        archived = None
+        try:
+            fields = await fetch_sport_sample(sport)
+            if fields.get("fact_type") == "error":
+                raise RuntimeError(fields.get("error", "No data available"))
+            route = await compose_fact_routed(fields, budget_ms=LLM_BUDGETS_MS["email"])
+            text = route.text or render_blurb(fields)
+            archived = fact_archive.record(
+                fields,
+                text,
+                model=route.model if route.text else "template",
+                llm=bool(route.text),
+                latency_ms=route.latency_ms,
+            )
+        except Exception as e:
+            logger.warning("fact of the day generation failed", extra={"sport": sport, "error": str(e)})
+            archived = fact_archive.fallback(sport)
+        if archived is None:
+            return None
+
+        row = FactOfTheDay(sport=sport, day=day, fact_id=archived.id, text=archived.text, llm=archived.llm)
+        try:
+            with Session(engine, expire_on_commit=False) as session:
+                session.add(row)
+                session.commit()
+        except IntegrityError:
+            # Another worker stored one first; everyone serves theirs
+            return self.get(sport, day)
+        logger.info("fact of the day stored", extra={"sport": sport, "day": day.isoformat(), "fact_id": archived.id})
+        return row
+
+    @staticmethod
+    def as_email_fact(fotd: FactOfTheDay) -> dict:
+        """The dict shape EmailService sends."""
+        with Session(engine) as session:
+            fact = session.get(Fact, fotd.fact_id) if fotd.fact_id else None
+        return {
+            "text": fotd.text,
+            "sport": fotd.sport,
+            "llm_used": fotd.llm,
+            "data": json.loads(fact.fields_json or "{}") if fact else {},
+        }
+
+
+# Singleton instance
+fact_of_the_day = FactOfTheDayService()
@@ -0,0 +1,52 @@
+# app/services/fact_pool.py
+"""
+Helpers for personalised daily emails.
+
+Each day a pool of FACT_POOL_SIZE facts per sport is generated once. Every
+subscriber starts at a pool position derived from a hash of their address and
+the date, and walks forward past facts they have already seen. What they have
+seen is kept on the subscriber row as a rolling list of 32-bit fact keys
+(4 bytes each, the last SEEN_HISTORY sends).
+"""
+import os
+import struct
+import zlib
+from datetime import date
+from typing import List, Optional, Sequence, Set, Tuple
+
+from app.services.fact_archive import fields_hash
+
+FACT_POOL_SIZE = int(os.getenv("FACT_POOL_SIZE", "20"))
+SEEN_HISTORY = int(os.getenv("SEEN_HISTORY", "365"))
+
+
+def fact_key(fact: dict) -> int:
+    """32-bit key for a fact: its source fields hash, or its text if there are no fields."""
+    data = fact.get("data")
+    digest = fields_hash(data) if data else fields_hash({"text": fact.get("text", "")})
+    return int(digest[:8], 16)
+
+
+def unpack_seen(blob: Optional[bytes]) -> List[int]:
+    if not blob:
+        return []
+    return list(struct.unpack(f"<{len(blob) // 4}I", blob[: len(blob) // 4 * 4]))
+
+
+def pack_seen(keys: Sequence[int]) -> bytes:
+    keys = keys[-SEEN_HISTORY:]
+    return struct.pack(f"<{len(keys)}I", *keys)
+
+
+def pick_unseen(pool: Sequence[Tuple[int, dict]], seen: Set[int], email: str, day: date) -> Tuple[int, dict]:
+    """
+    The subscriber's fact for `day`: start at a position hashed from email and
+    date, then probe forward to the first fact not in `seen`. If they have seen
+    the whole pool, the starting fact is reused.
+    """
+    start = zlib.crc32(f"{email.lower()}:{day.isoformat()}".encode("utf-8")) % len(pool)
+    for i in range(len(pool)):
+        key, fact = pool[(start + i) % len(pool)]
+        if key not in seen:
+            return key, fact
+    return pool[start]
@@ -0,0 +1,135 @@
+# app/services/feed.py
+import json
+import os
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.models import Fact
+from app.services.fact_archive import fact_archive
+
+FEED_SIZE = 20
+# Public site root for feed links (not the request's Host header, which clients control)
+SITE_URL = os.getenv("SITE_URL", "https://sportsfactoftheday.up.railway.app").rstrip("/") + "/"
+FEED_TITLES = {None: "Sports Facts", "mlb": "Sports Facts: MLB", "nba": "Sports Facts: NBA"}
+MEDIA_TYPES = {"json": "application/feed+json", "rss": "application/rss+xml; charset=utf-8"}
+
+
+class FeedBody(NamedTuple):
+    version: int
+    body: bytes
+    etag: str
+    last_modified: Optional[str]
+
+
+def _latest_id(sport: Optional[str]) -> int:
+    query = select(func.max(Fact.id))
+    if sport:
+        query = query.where(Fact.sport == sport)
+    with Session(engine) as session:
+        return session.exec(query).one() or 0
+
+
+def _json_feed(facts: List[Fact], sport: Optional[str], base_url: str) -> bytes:
+    feed = {
+        "version": "https://jsonfeed.org/version/1.1",
+        "title": FEED_TITLES[sport],
+        "home_page_url": base_url,
+        "feed_url": f"{base_url}feed.json" + (f"?sport={sport}" if sport else ""),
+        "items": [
+            {
+                "id": str(fact.id),
+                "content_text": fact.text,
+                "date_published": fact.created_at.replace(tzinfo=timezone.utc).isoformat(),
+                "tags": [fact.sport],
+            }
+            for fact in facts
+        ],
+    }
+    return json.dumps(feed, ensure_ascii=False).encode("utf-8")
+
+
+def _rss_feed(facts: List[Fact], sport: Optional[str], base_url: str) -> bytes:
+    items = "".join(
+        "<item>"
+        f"<title>{escape(fact.sport.upper())} fact</title>"
+        f"<description>{escape(fact.text)}</description>"
+        f'<guid isPermaLink="false">{fact.id}</guid>'
+        f"<category>{escape(fact.sport)}</category>"
+        f"<pubDate>{format_datetime(fact.created_at.replace(tzinfo=timezone.utc), usegmt=True)}</pubDate>"
+        "</item>"
+        for fact in facts
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0"><channel>'
+        f"<title>{escape(FEED_TITLES[sport])}</title>"
+        f"<link>{escape(base_url)}</link>"
+        "<description>Recently generated sports facts</description>"
+        f"{items}"
+        "</channel></rss>"
+    ).encode("utf-8")
+
+
+class FactFeed:
+    """
+    Recent facts as JSON Feed or RSS. Serialized bodies are cached per
+    (format, sport) and rebuilt only when a newer fact exists, so a
+    poll costs one max(id) lookup.
+    """
+
+    def __init__(self):
+        self._bodies: Dict[Tuple[str, Optional[str]], FeedBody] = {}
+
+    def render(self, fmt: str, sport: Optional[str]) -> FeedBody:
+        version = _latest_id(sport)
+        key = (fmt, sport)
+        cached = self._bodies.get(key)
+        if cached is not None and cached.version == version:
+            return cached
+
+        facts, _ = fact_archive.history(sport, None, FEED_SIZE)
+        build = _json_feed if fmt == "json" else _rss_feed
+        last_modified = None
+        if facts:
+            last_modified = format_datetime(facts[0].created_at.replace(tzinfo=timezone.utc), usegmt=True)
+        feed = FeedBody(
+            version=version,
+            body=build(facts, sport, SITE_URL),
+            etag=f'"{fmt}-{sport or "all"}-{version}"',
+            last_modified=last_modified,
+        )
+        self._bodies[key] = feed
+        return feed
+
+    @staticmethod
+    def not_modified(feed: FeedBody, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """Conditional GET check; If-None-Match wins over If-Modified-Since when both are sent."""
+        if if_none_match is not None:
+            return etag_matches(feed.etag, if_none_match)
+        if if_modified_since and feed.last_modified:
+            try:
+                return parsedate_to_datetime(feed.last_modified) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """If-None-Match check with weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == opaque
+        for tag in (tag.strip() for tag in if_none_match.split(","))
+    )
+
+
+# Singleton instance
+fact_feed = FactFeed()
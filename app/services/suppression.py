@@ -0,0 +1,99 @@
+# app/services/suppression.py
+import base64
+import hashlib
+import hmac
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.models import Suppression
+
+# Resend signs webhooks with Svix; the secret starts with "whsec_"
+RESEND_WEBHOOK_SECRET = os.getenv("RESEND_WEBHOOK_SECRET", "")
+SIGNATURE_TOLERANCE = 300  # seconds
+
+# Event types that should stop future sends
+SUPPRESS_EVENTS = {
+    "email.bounced": "bounce",
+    "email.complained": "complaint",
+}
+
+
+def verify_signature(body: bytes, headers: Dict[str, str]) -> bool:
+    """Check a Svix-style webhook signature against RESEND_WEBHOOK_SECRET."""
+    msg_id = headers.get("svix-id", "")
+    timestamp = headers.get("svix-timestamp", "")
+    signatures = headers.get("svix-signature", "")
+    if not (RESEND_WEBHOOK_SECRET and msg_id and timestamp and signatures):
+        return False
+    try:
+        if abs(time.time() - int(timestamp)) > SIGNATURE_TOLERANCE:
+            return False
+        key = base64.b64decode(RESEND_WEBHOOK_SECRET.split("_", 1)[-1])
+    except ValueError:
+        return False
+    signed = f"{msg_id}.{timestamp}.".encode("utf-8") + body
+    expected = base64.b64encode(hmac.new(key, signed, hashlib.sha256).digest()).decode()
+    for candidate in signatures.split():
+        _, _, sig = candidate.partition(",")
+        if hmac.compare_digest(sig, expected):
+            return True
+    return False
+
+
+def _recipients(event: dict) -> List[str]:
+    to = (event.get("data") or {}).get("to") or []
+    if isinstance(to, str):
+        to = [to]
+    return [addr.strip().lower() for addr in to if addr]
+
+
+def _is_soft_bounce(event: dict) -> bool:
+    bounce = (event.get("data") or {}).get("bounce") or {}
+    return str(bounce.get("type", "")).lower() in ("transient", "soft")
+
+
+def record_events(events: Iterable[dict]) -> int:
+    """
+    Store bounce/complaint recipients from a batch of provider events.
+    Soft bounces and other event types are ignored. Returns how many new
+    addresses were suppressed.
+    """
+    wanted: Dict[str, str] = {}
+    for event in events:
+        reason = SUPPRESS_EVENTS.get(event.get("type", ""))
+        if not reason or (reason == "bounce" and _is_soft_bounce(event)):
+            continue
+        for email in _recipients(event):
+            wanted.setdefault(email, reason)
+    if not wanted:
+        return 0
+
+    with Session(engine) as session:
+        existing = set(session.exec(
+            select(Suppression.email).where(Suppression.email.in_(list(wanted)))
+        ).all())
+        new = [Suppression(email=email, reason=reason) for email, reason in wanted.items() if email not in existing]
+        session.add_all(new)
+        session.commit()
+    return len(new)
+
+
+class SuppressionIndex:
+    """In-memory set of suppressed addresses, loaded once per send run."""
+    def __init__(self, emails: Set[str]):
+        self._emails = emails
+
+    @classmethod
+    def load(cls) -> "SuppressionIndex":
+        with Session(engine) as session:
+            return cls(set(session.exec(select(Suppression.email)).all()))
+
+    def __contains__(self, email: Optional[str]) -> bool:
+        return bool(email) and email.lower() in self._emails
+
+    def __len__(self) -> int:
+        return len(self._emails)
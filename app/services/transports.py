@@ -0,0 +1,420 @@
+# app/services/transports.py
+"""
+Email transports.
+
+EmailService hands each message to a transport chosen by EMAIL_TRANSPORT:
+
+- "resend" (default): one Resend API call per message, on the email executor.
+- "smtp": an async SMTP client over asyncio streams with a pool of
+  SMTP_POOL_SIZE persistent connections. Each connection takes up to
+  SMTP_BATCH queued messages at a time, and when the server advertises
+  PIPELINING (RFC 2920) it sends MAIL/RCPT/DATA as one write and chains each
+  message's end-of-data with the next message's commands, so a message costs
+  one round trip instead of four. TLS is implicit (SMTP_SSL=1, usually port
+  465); STARTTLS is not supported, so SMTP_USERNAME/PASSWORD are only sent
+  with SMTP_SSL=1.
+"""
+import asyncio
+import base64
+import os
+import ssl
+import time
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+from email.utils import make_msgid
+from typing import List, NamedTuple, Optional, Set, Tuple
+
+from app.executors import run_in
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "resend").lower()
+RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
+
+SMTP_HOST = os.getenv("SMTP_HOST", "")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_SSL = os.getenv("SMTP_SSL", "0") == "1"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_BATCH = int(os.getenv("SMTP_BATCH", "20"))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Longest a send() waits for its message to be queued, sent and acknowledged
+SMTP_SEND_TIMEOUT = float(os.getenv("SMTP_SEND_TIMEOUT", "120"))
+# Reconnect instead of reusing a connection idle for longer than this
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "30"))
+
+
+class OutgoingEmail(NamedTuple):
+    sender: str
+    to: str
+    subject: str
+    html: str
+
+
+class EmailSendError(Exception):
+    """The transport could not hand the message over. `permanent` if retrying cannot help."""
+
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+class EmailTransport:
+    name = "base"
+    # Sends worth keeping in flight at once (EMAIL_SEND_CONCURRENCY overrides)
+    concurrency = 8
+
+    def is_configured(self) -> bool:
+        raise NotImplementedError
+
+    async def send(self, message: OutgoingEmail) -> str:
+        """Deliver one message and return the provider's message ID. Raises EmailSendError."""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+# ------------------------------------------------------------
+# RESEND
+# ------------------------------------------------------------
+class ResendTransport(EmailTransport):
+    name = "resend"
+
+    def __init__(self, api_key: str = RESEND_API_KEY):
+        self.api_key = api_key
+        self._resend = None
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key) and self.api_key.startswith("re_")
+
+    def _client(self):
+        # The SDK (and requests under it) is imported on the first send, not at startup
+        if self._resend is None:
+            import resend
+            resend.api_key = self.api_key
+            self._resend = resend
+        return self._resend
+
+    async def send(self, message: OutgoingEmail) -> str:
+        resend = self._client()
+        params = {
+            "from": message.sender,
+            "to": message.to,
+            "subject": message.subject,
+            "html": message.html,
+        }
+        try:
+            response = await run_in("email", resend.Emails.send, params)
+        except resend.exceptions.ResendError as e:
+            # 4xx rejects this message; auth and rate-limit errors are ours and pass
+            code = int(e.code) if str(e.code).isdigit() else 0
+            raise EmailSendError(str(e), permanent=400 <= code < 500 and code not in (401, 403, 429))
+        if not response or "id" not in response:
+            raise EmailSendError(f"rejected: {response}")
+        return response["id"]
+
+
+# ------------------------------------------------------------
+# SMTP
+# ------------------------------------------------------------
+def _dot_stuff(data: bytes) -> bytes:
+    """CRLF line endings, leading dots doubled, terminated by CRLF.CRLF (RFC 5321 4.5.2)."""
+    lines = data.replace(b"\r\n", b"\n").split(b"\n")
+    if lines and lines[-1] == b"":
+        lines.pop()
+    body = b"\r\n".join(b"." + line if line.startswith(b".") else line for line in lines)
+    return body + b"\r\n.\r\n"
+
+
+def _envelope_address(address: str) -> str:
+    """Bare address for MAIL FROM/RCPT TO, accepting "Name <addr>" too."""
+    if "<" in address and address.endswith(">"):
+        return address[address.index("<") + 1:-1]
+    return address
+
+
+def build_mime(message: OutgoingEmail, message_id: str) -> bytes:
+    mime = EmailMessage()
+    mime["From"] = message.sender
+    mime["To"] = message.to
+    mime["Subject"] = message.subject
+    mime["Message-ID"] = message_id
+    mime.set_content("This email is best viewed in an HTML-capable client.")
+    mime.add_alternative(message.html, subtype="html")
+    return mime.as_bytes(policy=SMTP_POLICY)
+
+
+class SmtpError(EmailSendError):
+    def __init__(self, code: int, text: str):
+        super().__init__(f"{code} {text}", permanent=code >= 500)
+        self.code = code
+
+
+class SmtpConnection:
+    def __init__(self, host: str, port: int, use_ssl: bool, username: str, password: str):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.pipelining = False
+        self.last_used = 0.0
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    @property
+    def open(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def _reply(self) -> Tuple[int, str]:
+        """One (possibly multi-line) reply: 250-a / 250-b / 250 c."""
+        lines = []
+        while True:
+            raw = await asyncio.wait_for(self._reader.readline(), SMTP_TIMEOUT)
+            if not raw:
+                raise ConnectionError("SMTP server closed the connection")
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            if not line[:3].isdigit():
+                raise ConnectionError(f"malformed SMTP reply: {line[:80]!r}")
+            lines.append(line[4:])
+            if len(line) < 4 or line[3] != "-":
+                return int(line[:3]), "\n".join(lines)
+
+    async def _command(self, line: str, expect: int) -> str:
+        self._writer.write(line.encode("utf-8") + b"\r\n")
+        await self._writer.drain()
+        code, text = await self._reply()
+        if code != expect:
+            raise SmtpError(code, text)
+        return text
+
+    async def connect(self):
+        context = ssl.create_default_context() if self.use_ssl else None
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context), SMTP_TIMEOUT
+        )
+        code, text = await self._reply()
+        if code != 220:
+            raise SmtpError(code, text)
+        features = await self._command("EHLO sports-facts", 250)
+        extensions = {line.split(" ", 1)[0].upper() for line in features.splitlines()[1:]}
+        self.pipelining = "PIPELINING" in extensions
+        if self.username:
+            if not self.use_ssl:
+                # No STARTTLS support, so AUTH would send the password in the clear
+                raise EmailSendError("refusing SMTP AUTH without TLS; set SMTP_SSL=1")
+            token = base64.b64encode(f"\0{self.username}\0{self.password}".encode("utf-8")).decode()
+            await self._command(f"AUTH PLAIN {token}", 235)
+        self.last_used = time.monotonic()
+
+    async def close(self):
+        if not self.open:
+            return
+        try:
+            self._writer.write(b"QUIT\r\n")
+            await self._writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        self._writer.close()
+        self._writer = None
+
+    async def ensure_open(self):
+        if self.open and time.monotonic() - self.last_used > SMTP_IDLE_SECONDS:
+            await self.close()
+        if not self.open:
+            await self.connect()
+
+    @staticmethod
+    def _envelope(message: OutgoingEmail) -> bytes:
+        return (
+            f"MAIL FROM:<{_envelope_address(message.sender)}>\r\n"
+            f"RCPT TO:<{_envelope_address(message.to)}>\r\n"
+            "DATA\r\n"
+        ).encode("utf-8")
+
+    async def send_batch(self, batch: List[Tuple[OutgoingEmail, bytes, str]]) -> List[Optional[Exception]]:
+        """
+        Send (message, mime bytes, message id) tuples; returns None or the error for each.
+        A connection error fails the rest of the batch and closes the connection.
+        """
+        results: List[Optional[Exception]] = [None] * len(batch)
+        try:
+            if self.pipelining:
+                await self._send_pipelined(batch, results)
+            else:
+                for i, (message, data, _) in enumerate(batch):
+                    results[i] = await self._send_lockstep(message, data)
+        except (ConnectionError, OSError, asyncio.TimeoutError) as e:
+            for i, result in enumerate(results):
+                if result is None:
+                    results[i] = EmailSendError(f"connection failed: {e!r}")
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            logger.warning("smtp connection failed", extra={"host": self.host, "error": repr(e)})
+        self.last_used = time.monotonic()
+        return results
+
+    async def _send_lockstep(self, message: OutgoingEmail, data: bytes) -> Optional[Exception]:
+        try:
+            await self._command(f"MAIL FROM:<{_envelope_address(message.sender)}>", 250)
+            await self._command(f"RCPT TO:<{_envelope_address(message.to)}>", 250)
+            await self._command("DATA", 354)
+            self._writer.write(_dot_stuff(data))
+            await self._writer.drain()
+            code, text = await self._reply()
+            if code != 250:
+                return SmtpError(code, text)
+            return None
+        except SmtpError as e:
+            await self._command("RSET", 250)
+            return e
+
+    async def _send_pipelined(self, batch: List[Tuple[OutgoingEmail, bytes, str]], results: List[Optional[Exception]]):
+        # Bytes to send ahead of the next envelope (previous body, or RSET), and
+        # the replies they will produce: (kind, batch index)
+        tail = b""
+        tail_replies: List[Tuple[str, int]] = []
+        done = [False] * len(batch)
+
+        async def read_tail():
+            for kind, index in tail_replies:
+                code, text = await self._reply()
+                if kind == "end":
+                    done[index] = True
+                    if code != 250:
+                        results[index] = SmtpError(code, text)
+
+        for i, (message, data, _) in enumerate(batch):
+            self._writer.write(tail + self._envelope(message))
+            await self._writer.drain()
+            await read_tail()
+
+            mail, rcpt, data_reply = await self._reply(), await self._reply(), await self._reply()
+            if data_reply[0] == 354 and mail[0] == 250 and rcpt[0] in (250, 251):
+                tail, tail_replies = _dot_stuff(data), [("end", i)]
+                continue
+
+            failed = next(reply for reply in (mail, rcpt, data_reply) if reply[0] not in (250, 251, 354))
+            results[i] = SmtpError(*failed)
+            done[i] = True
+            if data_reply[0] == 354:
+                # DATA was accepted anyway: end it empty, then reset the transaction
+                tail, tail_replies = b".\r\nRSET\r\n", [("discard", i), ("rset", i)]
+            elif mail[0] == 250:
+                tail, tail_replies = b"RSET\r\n", [("rset", i)]
+            else:
+                tail, tail_replies = b"", []
+
+        if tail:
+            self._writer.write(tail)
+            await self._writer.drain()
+            await read_tail()
+
+
+class SmtpTransport(EmailTransport):
+    """Pooled SMTP: SMTP_POOL_SIZE workers, each owning one connection and draining the shared queue."""
+    name = "smtp"
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        use_ssl: bool = SMTP_SSL,
+        username: str = SMTP_USERNAME,
+        password: str = SMTP_PASSWORD,
+        pool_size: int = SMTP_POOL_SIZE,
+        batch: int = SMTP_BATCH,
+    ):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.pool_size = max(1, pool_size)
+        self.batch = max(1, batch)
+        # Enough messages in flight to fill every connection's batch
+        self.concurrency = self.pool_size * self.batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # Futures of messages a worker has taken off the queue and is sending
+        self._in_flight: Set[asyncio.Future] = set()
+
+    def is_configured(self) -> bool:
+        # Credentials are only sent over TLS (see SmtpConnection.connect)
+        return bool(self.host) and (self.use_ssl or not self.username)
+
+    def _start(self):
+        # Created on first use so the queue and tasks belong to the running loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.pool_size)]
+
+    async def send(self, message: OutgoingEmail) -> str:
+        self._start()
+        message_id = make_msgid(domain=_envelope_address(message.sender).rpartition("@")[2] or None)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((message, build_mime(message, message_id), message_id, future))
+        try:
+            await asyncio.wait_for(future, SMTP_SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            if future in self._in_flight:
+                # Already handed to the server: it may have been delivered, so a
+                # retry could send it twice. Report it as final instead.
+                raise EmailSendError(f"no reply within {SMTP_SEND_TIMEOUT:g}s, delivery unknown", permanent=True)
+            # Still queued: the worker skips cancelled futures, so a retry is safe
+            raise EmailSendError(f"no reply within {SMTP_SEND_TIMEOUT:g}s")
+        finally:
+            self._in_flight.discard(future)
+        return message_id
+
+    async def _worker(self):
+        connection = SmtpConnection(self.host, self.port, self.use_ssl, self.username, self.password)
+        try:
+            while True:
+                items = [await self._queue.get()]
+                while len(items) < self.batch and not self._queue.empty():
+                    items.append(self._queue.get_nowait())
+                items = [item for item in items if not item[3].done()]
+                if not items:
+                    continue
+                self._in_flight.update(item[3] for item in items)
+                try:
+                    await connection.ensure_open()
+                    errors = await connection.send_batch([item[:3] for item in items])
+                except (EmailSendError, ConnectionError, OSError, asyncio.TimeoutError) as e:
+                    await connection.close()
+                    errors = [EmailSendError(f"connect failed: {e!r}")] * len(items)
+                except Exception as e:
+                    # Anything unexpected fails this batch only; the connection
+                    # state is unknown, so drop it and keep the worker running
+                    logger.error("smtp batch failed", extra={"host": self.host, "error": repr(e)})
+                    await connection.close()
+                    errors = [EmailSendError(f"send failed: {e!r}")] * len(items)
+                for (_, _, _, future), error in zip(items, errors):
+                    if future.done():
+                        continue
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+        finally:
+            await connection.close()
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+
+def make_transport(kind: str = EMAIL_TRANSPORT) -> EmailTransport:
+    if kind == "smtp":
+        return SmtpTransport()
+    if kind != "resend":
+        logger.warning("unknown EMAIL_TRANSPORT, using resend", extra={"transport": kind})
+    return ResendTransport()
@@ -0,0 +1,126 @@
+# benchmarks/import_time.py
+"""
+Cold-start check: import cost of app.main and time to the first served request.
+
+Runs `python -X importtime -c "import app.main"` in fresh subprocesses, reports
+the slowest imports, and fails (exit 1) if the best run is over `--budget-ms`
+or if any module that should load lazily is imported at startup:
+
+    python benchmarks/import_time.py --runs 5 --budget-ms 1500
+    python benchmarks/import_time.py --serve     # also time uvicorn start -> 200 from /healthz
+
+Run from the repository root. Uses a throwaway SQLite database and disables
+the scheduler so nothing reaches the network.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use, never by `import app.main`
+LAZY_MODULES = ["resend", "requests", "numpy", "apscheduler", "jinja2", "httpx", "nba_api"]
+
+
+def _env(tmp: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        "WAREHOUSE_DIR": os.path.join(tmp, "warehouse"),
+        "SCHEDULER_ENABLED": "0",
+        "PYTHONPATH": ROOT,
+    })
+    return env
+
+
+def importtime(env: Dict[str, str]) -> Tuple[int, List[Tuple[int, int, str]]]:
+    """(total microseconds for app.main, [(self_us, cumulative_us, module)])."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        rows.append((int(self_us), int(cumulative_us), name, depth))
+        if name == "app.main":
+            total = int(cumulative_us)
+    return total, [(s, c, n) for s, c, n, depth in rows if depth <= 1]
+
+
+def loaded_lazy_modules(env: Dict[str, str]) -> List[str]:
+    code = f"import sys, app.main; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def first_request_ms(env: Dict[str, str]) -> float:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < 60:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1) as resp:
+                    if resp.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("server did not answer /healthz within 60s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--serve", action="store_true", help="also time process start to first /healthz response")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(tmp)
+        runs = [importtime(env) for _ in range(args.runs)]
+        total, rows = min(runs, key=lambda run: run[0])
+        lazy = loaded_lazy_modules(env)
+
+        print(f"import app.main: best {total / 1000:.0f} ms of {args.runs} runs (budget {args.budget_ms:g} ms)")
+        print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+        for self_us, cumulative_us, name in sorted(rows, key=lambda row: -row[1])[:args.top]:
+            print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
+
+        if args.serve:
+            print(f"process start -> first /healthz: {first_request_ms(env):.0f} ms")
+
+    failed = False
+    if lazy:
+        print(f"FAIL: imported at startup but should be lazy: {', '.join(lazy)}")
+        failed = True
+    if total / 1000 > args.budget_ms:
+        print(f"FAIL: over budget by {total / 1000 - args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/nba_parse.py
+"""
+Compare the old pandas NBA path with the raw result-set path.
+
+Runs offline on a synthetic AllTimeLeadersGrids payload with the real shape
+(10 leader result sets of `--topx` rows), so it needs no network:
+
+    python benchmarks/nba_parse.py --topx 10 --runs 2000
+
+Reports cold import cost and RSS growth (in fresh subprocesses), plus
+per-call parse latency and peak traced allocations for picking one leader.
+"""
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+CATEGORIES = ["GP", "PTS", "AST", "STL", "OREB", "DREB", "REB", "BLK", "FGM", "FGA"]
+
+
+def payload(topx: int) -> dict:
+    result_sets = []
+    for stat in CATEGORIES:
+        headers = ["PLAYER_ID", "PLAYER_NAME", stat, f"{stat}_RANK", "IS_ACTIVE_FLAG"]
+        rows = [
+            [1000 + i, f"Player {i}", 40000 - i * 97, i + 1, random.choice("YN")]
+            for i in range(topx)
+        ]
+        result_sets.append({"name": f"{stat}Leaders", "headers": headers, "rowSet": rows})
+    return {"resource": "alltimeleadersgrids", "resultSets": result_sets}
+
+
+def pick_pandas(data: dict) -> dict:
+    # What get_data_frames() + df.sample(1) did: a DataFrame per result set
+    from pandas import DataFrame
+
+    frames = [DataFrame(rs["rowSet"], columns=rs["headers"]) for rs in data["resultSets"]]
+    row = frames[1].sample(1).iloc[0]
+    return {"player_name": row.get("PLAYER_NAME"), "value": row.get("PTS"), "rank": int(row.get("PTS_RANK"))}
+
+
+def pick_raw(data: dict) -> dict:
+    rs = data["resultSets"][1]
+    row = dict(zip(rs["headers"], random.choice(rs["rowSet"])))
+    return {"player_name": row.get("PLAYER_NAME"), "value": row.get("PTS"), "rank": int(row.get("PTS_RANK"))}
+
+
+def cold_start(module: str) -> dict:
+    """Import time and max-RSS growth for importing `module` in a fresh interpreter."""
+    code = (
+        "import resource, time, json;"
+        "before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss;"
+        "t = time.perf_counter();"
+        f"import {module};"
+        "ms = (time.perf_counter() - t) * 1000;"
+        "after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss;"
+        "print(json.dumps({'import_ms': round(ms, 1), 'rss_mb': round((after - before) / 1024, 1)}))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def measure(pick, data: dict, runs: int) -> dict:
+    pick(data)  # warm up (and pay any lazy import outside the timing)
+    started = time.perf_counter()
+    for _ in range(runs):
+        pick(data)
+    per_call_us = (time.perf_counter() - started) / runs * 1e6
+
+    tracemalloc.start()
+    pick(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"per_call_us": round(per_call_us, 1), "peak_kb": round(peak / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--topx", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    data = payload(args.topx)
+    print(f"payload: {len(json.dumps(data)) / 1024:.1f} KiB, {len(CATEGORIES)} result sets x {args.topx} rows")
+    print("cold import  nba_api.stats.endpoints (pandas):", cold_start("nba_api.stats.endpoints.alltimeleadersgrids"))
+    print("cold import  nba_api.stats.library.http (raw):", cold_start("nba_api.stats.library.http"))
+    print("pick leader  pandas:", measure(pick_pandas, data, args.runs))
+    print("pick leader  raw:   ", measure(pick_raw, data, args.runs))
+    print("max RSS of this process:", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024, "MiB")
+
+
+if __name__ == "__main__":
+    main()
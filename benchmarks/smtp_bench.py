@@ -0,0 +1,69 @@
+# benchmarks/smtp_bench.py
+"""
+Delivery throughput of the SMTP transport against the local stub server.
+
+Sends `--messages` emails through SmtpTransport for each pool size, with and
+without PIPELINING advertised, over a simulated `--delay-ms` round trip:
+
+    python benchmarks/smtp_bench.py --messages 500 --delay-ms 20 --pools 1,4,8
+
+Run from the repository root so `app` is importable.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_stub import StubSmtpServer  # noqa: E402
+from app.services.transports import OutgoingEmail, SmtpTransport  # noqa: E402
+
+HTML = "<p>" + "Did you know? " * 40 + "</p>"
+
+
+async def run_once(messages: int, pool_size: int, batch: int, delay: float, pipelining: bool, concurrency: int):
+    server = StubSmtpServer(delay, pipelining)
+    port = await server.start()
+    transport = SmtpTransport(host="127.0.0.1", port=port, use_ssl=False, username="", password="",
+                              pool_size=pool_size, batch=batch)
+    # Same default as EmailService: enough in flight to fill every connection's batch
+    limit = asyncio.Semaphore(concurrency or transport.concurrency)
+
+    async def send(i: int):
+        async with limit:
+            await transport.send(OutgoingEmail("Sports Facts <facts@example.com>", f"user{i}@example.com", "Bench", HTML))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(messages)))
+    elapsed = time.perf_counter() - started
+    await transport.close()
+    await server.close()
+    assert server.delivered == messages, (server.delivered, messages)
+    return elapsed, server.round_trips, server.connections
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--delay-ms", type=float, default=20)
+    parser.add_argument("--pools", default="1,4,8")
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="messages in flight (EMAIL_SEND_CONCURRENCY); 0 = pool size * batch, as in the app")
+    args = parser.parse_args()
+
+    print(f"{args.messages} messages, {args.delay_ms:g} ms simulated RTT, batch {args.batch}")
+    print(f"{'pool':>5} {'pipelining':>11} {'seconds':>9} {'msg/s':>9} {'round trips':>12} {'conns':>6}")
+    for pool_size in (int(p) for p in args.pools.split(",")):
+        for pipelining in (False, True):
+            elapsed, trips, conns = asyncio.run(run_once(
+                args.messages, pool_size, args.batch, args.delay_ms / 1000, pipelining, args.concurrency,
+            ))
+            print(f"{pool_size:>5} {str(pipelining):>11} {elapsed:>9.2f} {args.messages / elapsed:>9.0f} {trips:>12} {conns:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# benchmarks/smtp_stub.py
+"""
+Minimal SMTP sink for local delivery benchmarks.
+
+Accepts any envelope, discards message bodies and counts them. Each batch of
+replies is held back `--delay-ms` to stand in for network round-trip time,
+which is what pipelining and connection pooling save. Advertises PIPELINING
+unless `--no-pipelining` is given.
+
+    python benchmarks/smtp_stub.py --port 2525 --delay-ms 20
+
+Point the app at it with EMAIL_TRANSPORT=smtp SMTP_HOST=127.0.0.1 SMTP_PORT=2525.
+"""
+import argparse
+import asyncio
+from typing import Optional
+
+
+class StubSmtpServer:
+    def __init__(self, delay: float = 0.0, pipelining: bool = True, reject: str = ""):
+        self.delay = delay
+        self.pipelining = pipelining
+        # Recipients containing this string get 550
+        self.reject = reject
+        self.delivered = 0
+        self.connections = 0
+        self.round_trips = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._session, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        writer.write(b"220 stub ESMTP\r\n")
+        in_data = False
+        has_rcpt = False
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                # Complete lines only; keep a partial line for the next read
+                while not chunk.endswith(b"\n"):
+                    more = await reader.read(65536)
+                    if not more:
+                        break
+                    chunk += more
+                replies = []
+                for line in chunk.split(b"\r\n")[:-1]:
+                    if in_data:
+                        if line == b".":
+                            in_data = False
+                            self.delivered += 1
+                            replies.append(b"250 2.0.0 queued")
+                        continue
+                    verb = line[:4].upper()
+                    if verb == b"EHLO":
+                        features = [b"250-stub", b"250-8BITMIME", b"250-AUTH PLAIN"]
+                        if self.pipelining:
+                            features.append(b"250-PIPELINING")
+                        replies.extend(features + [b"250 SMTPUTF8"])
+                    elif verb == b"AUTH":
+                        replies.append(b"235 2.7.0 ok")
+                    elif verb == b"MAIL":
+                        has_rcpt = False
+                        replies.append(b"250 2.1.0 ok")
+                    elif verb == b"RCPT":
+                        if self.reject and self.reject.encode() in line:
+                            replies.append(b"550 5.1.1 no such user")
+                        else:
+                            has_rcpt = True
+                            replies.append(b"250 2.1.5 ok")
+                    elif verb == b"DATA":
+                        if has_rcpt:
+                            in_data = True
+                            replies.append(b"354 go ahead")
+                        else:
+                            replies.append(b"554 5.5.1 no valid recipients")
+                    elif verb == b"RSET":
+                        has_rcpt = False
+                        replies.append(b"250 2.0.0 ok")
+                    elif verb == b"QUIT":
+                        writer.write(b"221 bye\r\n")
+                        await writer.drain()
+                        return
+                    else:
+                        replies.append(b"502 5.5.2 not implemented")
+                if replies:
+                    self.round_trips += 1
+                    if self.delay:
+                        await asyncio.sleep(self.delay)
+                    writer.write(b"\r\n".join(replies) + b"\r\n")
+                    await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(args):
+    server = StubSmtpServer(args.delay_ms / 1000, not args.no_pipelining)
+    port = await server.start(args.host, args.port)
+    print(f"stub SMTP listening on {args.host}:{port}")
+    try:
+        while True:
+            await asyncio.sleep(5)
+            print(f"delivered={server.delivered} connections={server.connections} round_trips={server.round_trips}")
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--delay-ms", type=float, default=20)
+    parser.add_argument("--no-pipelining", action="store_true")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()